@@ -1,11 +1,14 @@
 import io
-from typing import Any, MutableMapping, Optional
+from typing import Any, Dict, Mapping, MutableMapping, Optional, Sequence, Tuple
 
 import pandas as pd
 
 from covidhub.error import MetadataNotFoundError, MultipleRowsError
 from covidhub.google.drive import DriveService, NUM_RETRIES
 
+# mapping from a column value to the positions of the rows that contain it
+RowIndex = Mapping[Any, Sequence[int]]
+
 
 class CollectiveForm:
     SHEET_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
@@ -18,11 +21,44 @@ class CollectiveForm:
             .execute(num_retries=NUM_RETRIES)
         )
         self.skip_header = skip_header
+        self._sheets: Dict[str, pd.DataFrame] = {}
+        self._row_indices: Dict[Tuple[str, str], RowIndex] = {}
 
     def __getitem__(self, item):
-        """Returns a dataframe from a sheet in the file from its sheet name"""
-        return pd.read_excel(
-            self.sheet_io, sheet_name=item, skiprows=[1] if self.skip_header else None
+        """Returns a dataframe from a sheet in the file from its sheet name. Each sheet
+        is only parsed once, so the dataframe is shared between callers and should not
+        be modified in place."""
+        if item not in self._sheets:
+            self._sheets[item] = pd.read_excel(
+                self.sheet_io,
+                sheet_name=item,
+                skiprows=[1] if self.skip_header else None,
+            )
+        return self._sheets[item]
+
+    def row_index(self, item: str, column_name: str) -> RowIndex:
+        """Returns an index from the values in a column of a sheet to the positions of
+        the rows that contain them. The index is built once per sheet and column."""
+        key = (item, column_name)
+        if key not in self._row_indices:
+            self._row_indices[key] = self[item].groupby(column_name, sort=False).indices
+        return self._row_indices[key]
+
+    def single_row(
+        self,
+        item: str,
+        column_name: str,
+        column_value: Any,
+        result_index: Optional[int] = None,
+    ) -> MutableMapping[str, Any]:
+        """Like clean_single_row, for a sheet in this file. Matching rows are found with
+        ``row_index`` rather than by comparing every row of the sheet."""
+        return clean_single_row(
+            self[item],
+            column_name,
+            column_value,
+            result_index,
+            row_index=self.row_index(item, column_name),
         )
 
 
@@ -31,6 +67,8 @@ def clean_single_row(
     column_name: str,
     column_value: Any,
     result_index: Optional[int] = None,
+    *,
+    row_index: Optional[RowIndex] = None,
 ) -> MutableMapping[str, Any]:
     """Given a pandas dataframe, filter the rows where a column matches a given value.
     Then use ``result_index`` to select from the remaining rows.  This resulting
@@ -49,8 +87,15 @@ def clean_single_row(
         The row to extract.  This obeys standard python slicing semantics (e.g., 0 =
         first row, -1 = last row).  If ``result_index`` is None and more than one row is
          in the dataframe, then MultipleMatchesError is raised.
+    row_index: Optional[RowIndex]
+        A precomputed index of ``column_name``, as returned by
+        ``CollectiveForm.row_index``. If provided, it is used to find the matching rows
+        instead of filtering the whole dataframe.
     """
-    filtered_df = df[df[column_name] == column_value]
+    if row_index is None:
+        filtered_df = df[df[column_name] == column_value]
+    else:
+        filtered_df = df.iloc[row_index.get(column_value, [])]
     if len(filtered_df) == 0:
         raise MetadataNotFoundError(
             f"No metadata found for {column_name}={column_value}"
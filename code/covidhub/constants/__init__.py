@@ -17,6 +17,9 @@ SOP_EXTRACTIONS = {"SOP-V1", "SOP-V2", "SOP-V3"}
 ROWS_96 = list(string.ascii_uppercase[:8])
 COLS_96 = range(1, 13)
 
+# the well id of each (row, col) position on a 96-well plate
+WELL_ID_GRID = {(row, col): f"{row}{col}" for row in ROWS_96 for col in COLS_96}
+
 ROWS_384 = list(string.ascii_uppercase[:16])
 COLS_384 = range(1, 25)
 
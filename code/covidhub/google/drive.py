@@ -144,12 +144,20 @@ def get_contents_by_folder_id(
     folder_id: str = None,
     *,
     only_files: bool = False,
+    name_contains: Sequence[str] = (),
     page_size: int = 100,
 ) -> List[DriveObject]:
-    """Given an ID of a folder, return a list of the contents."""
+    """Given an ID of a folder, return a list of the contents. If name_contains is
+    given, only the contents with a name that contains (i.e. starts with, in Drive's
+    word-prefix matching) one of the terms are returned."""
     query = f"'{_q_escape(folder_id)}' in parents AND trashed = false"
     if only_files:
         query = query + f" AND mimeType != '{GDRIVE_FOLDER_MIMETYPE}'"
+    if name_contains:
+        name_query = " OR ".join(
+            f"name contains '{_q_escape(term)}'" for term in name_contains
+        )
+        query = query + f" AND ({name_query})"
     page_token = None
     accumulator = []
     while True:
@@ -1,3 +1,4 @@
+import functools
 import json
 
 import boto3
@@ -11,9 +12,13 @@ from requests.adapters import HTTPAdapter
 from urllib3 import Retry
 
 
+@functools.lru_cache(maxsize=4)
 def get_secrets_manager_credentials(
     secret_id: str = "covid-19/google_creds",
 ) -> service_account.Credentials:
+    """Fetch the Google service account credentials stored in a secret. These are
+    cached per secret, so later calls (e.g. in a warm Lambda container) skip the
+    secrets manager round trip."""
     client = boto3.client("secretsmanager", region_name="us-west-2")
     secret_string = client.get_secret_value(SecretId=secret_id)["SecretString"]
 
@@ -84,8 +84,17 @@ def _plot_96_wells(fig, y_ticks):
 
     y_max = y_ticks[-1]
 
+    # fixed extents, so the figure can be saved without a tight bounding box
     gs = GridSpec(
-        n_rows, n_cols, figure=fig, wspace=0.0, hspace=0.0, top=0.85, bottom=0.05
+        n_rows,
+        n_cols,
+        figure=fig,
+        wspace=0.0,
+        hspace=0.0,
+        left=0.04,
+        right=0.99,
+        top=0.85,
+        bottom=0.05,
     )
 
     ax = None
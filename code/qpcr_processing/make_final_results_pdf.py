@@ -541,7 +541,7 @@ def format_ct_curves(results: ProcessingResults):
     fig = plot_ct_curves(results)
 
     imgdata = BytesIO()
-    fig.savefig(imgdata, format="svg", bbox_inches="tight")
+    fig.savefig(imgdata, format="svg")
     imgdata.seek(0)  # rewind the data
     drawing = svg2rlg(imgdata)
 
@@ -555,7 +555,7 @@ def format_background_ct_curves(results: ProcessingResults, styles):
         fig = plot_background_ct_curves(results, fluor)
 
         imgdata = BytesIO()
-        fig.savefig(imgdata, format="svg", bbox_inches="tight")
+        fig.savefig(imgdata, format="svg")
         imgdata.seek(0)  # rewind the data
         drawing = svg2rlg(imgdata)
 
@@ -1,14 +1,14 @@
 from __future__ import annotations
 
+import functools
 import html
 import logging
-from collections import defaultdict
-from dataclasses import dataclass
-from typing import Dict, Optional
+from enum import Enum
+from typing import Dict, Optional, Type
 
 import pandas as pd
 
-from covidhub.collective_form import clean_single_row, CollectiveForm
+from covidhub.collective_form import CollectiveForm
 from covidhub.constants import Fluor, SamplePlateType, SOP_EXTRACTIONS
 from covidhub.constants.enums import ControlsMappingType
 from covidhub.constants.qpcr_forms import (
@@ -24,47 +24,121 @@ from qpcr_processing.protocol import Protocol
 
 logger = logging.getLogger(__name__)
 
+# lookup tables for parsing enum values, cheaper than calling the enum constructor
+_FLUOR_BY_VALUE = {fluor.value: fluor for fluor in Fluor}
+_SAMPLE_TYPE_BY_VALUE = {sample.value: sample for sample in SamplePlateType}
+_CONTROLS_BY_VALUE = {controls.value: controls for controls in ControlsMappingType}
+
+
+def _parse_enum(lookup: Dict[str, Enum], value: str, enum_type: Type[Enum]) -> Enum:
+    """Look up an enum member by value, raising ValueError like the enum constructor"""
+    try:
+        return lookup[value]
+    except KeyError:
+        raise ValueError(f"{value!r} is not a valid {enum_type.__name__}") from None
+
 
 class ReportNote:
+    __slots__ = ("body", "timestamp", "researcher", "_html")
+
     def __init__(
         self, body: str = None, timestamp: str = None, researcher: str = None,
     ):
         self.body = body
         self.timestamp = timestamp
         self.researcher = researcher
+        self._html = None
 
     def __str__(self):
         return f"{self.researcher}; {self.timestamp}; {self.body}"
 
     def to_html(self) -> str:
         """Return a HTML sequence representing this ReportNote."""
-        researcher = html.escape(self.researcher)
-        timestamp = html.escape(str(self.timestamp))
-        body = html.escape(self.body)
-        return f"<b>{researcher} [{timestamp}]:</b> {body}"
+        if self._html is None:
+            timestamp = self.timestamp
+            if not isinstance(timestamp, str):
+                timestamp = str(timestamp)
+            self._html = (
+                f"<b>{html.escape(self.researcher)} [{html.escape(timestamp)}]:</b>"
+                f" {html.escape(self.body)}"
+            )
+        return self._html
+
+
+def _format_sheet_note(row) -> Optional[ReportNote]:
+    body = row[Base.NOTES]
+    if body and body.strip():
+        timestamp = row[Base.TIMESTAMP]
+        researcher = row[Base.RESEARCHER_NAME]
+        return ReportNote(body.strip(), timestamp, researcher)
+    else:
+        return None
 
 
-@dataclass
 class BravoMetadata:
-    pcr_barcode: str
-    rna_barcode: str = "MISSING"
-    sample_barcode: str = "MISSING"
-    researcher: str = "MISSING"
-    extraction_version: str = "MISSING"
-    sample_type: SamplePlateType = None
-    experimental_run: bool = True
-    controls_type: ControlsMappingType = None
-    bravo_rerun_notes: Optional[ReportNote] = None
-    bravo_rna_notes: Optional[ReportNote] = None
-    bravo_station: Optional[str] = None
-    rna_description: Optional[str] = None
-    qpcr_description: Optional[str] = None
-    sample_source: Optional[str] = None
-    qpcr_notes: Optional[ReportNote] = None
-    qpcr_station: Optional[str] = None
-    sample_plate_metadata_notes: Optional[ReportNote] = None
-    sop_protocol: Optional[str] = None
-    starting_bravo_notes: Optional[ReportNote] = None
+    __slots__ = (
+        "pcr_barcode",
+        "rna_barcode",
+        "sample_barcode",
+        "researcher",
+        "extraction_version",
+        "sample_type",
+        "experimental_run",
+        "controls_type",
+        "bravo_rerun_notes",
+        "bravo_rna_notes",
+        "bravo_station",
+        "rna_description",
+        "qpcr_description",
+        "sample_source",
+        "qpcr_notes",
+        "qpcr_station",
+        "sample_plate_metadata_notes",
+        "sop_protocol",
+        "starting_bravo_notes",
+    )
+
+    def __init__(
+        self,
+        pcr_barcode: str,
+        rna_barcode: str = "MISSING",
+        sample_barcode: str = "MISSING",
+        researcher: str = "MISSING",
+        extraction_version: str = "MISSING",
+        sample_type: SamplePlateType = None,
+        experimental_run: bool = True,
+        controls_type: ControlsMappingType = None,
+        bravo_rerun_notes: Optional[ReportNote] = None,
+        bravo_rna_notes: Optional[ReportNote] = None,
+        bravo_station: Optional[str] = None,
+        rna_description: Optional[str] = None,
+        qpcr_description: Optional[str] = None,
+        sample_source: Optional[str] = None,
+        qpcr_notes: Optional[ReportNote] = None,
+        qpcr_station: Optional[str] = None,
+        sample_plate_metadata_notes: Optional[ReportNote] = None,
+        sop_protocol: Optional[str] = None,
+        starting_bravo_notes: Optional[ReportNote] = None,
+    ):
+        self.pcr_barcode = pcr_barcode
+        self.rna_barcode = rna_barcode
+        self.sample_barcode = sample_barcode
+        self.researcher = researcher
+        self.extraction_version = extraction_version
+        self.sample_type = sample_type
+        self.experimental_run = experimental_run
+        self.controls_type = controls_type
+        self.bravo_rerun_notes = bravo_rerun_notes
+        self.bravo_rna_notes = bravo_rna_notes
+        self.bravo_station = bravo_station
+        self.rna_description = rna_description
+        self.qpcr_description = qpcr_description
+        self.sample_source = sample_source
+        self.qpcr_notes = qpcr_notes
+        self.qpcr_station = qpcr_station
+        self.sample_plate_metadata_notes = sample_plate_metadata_notes
+        self.sop_protocol = sop_protocol
+        self.starting_bravo_notes = starting_bravo_notes
 
     @classmethod
     def load_from_spreadsheet(
@@ -73,7 +147,7 @@ class BravoMetadata:
         instance = cls(pcr_barcode)
 
         logger.info(
-            msg=f"Initializing Bravo metadata for PCR Plate Barcode: {pcr_barcode}"
+            "Initializing Bravo metadata for PCR Plate Barcode: %s", pcr_barcode
         )
 
         if collective_form is not None:
@@ -82,58 +156,58 @@ class BravoMetadata:
         return instance
 
     def _parse(self, collective_form: CollectiveForm):
-        bravo_rna = collective_form[BravoRNAExtraction.SHEET_NAME]
-        bravo_rerun = collective_form[RNARerun.SHEET_NAME]
-        qpcr_metadata = collective_form[QPCRMetadata.SHEET_NAME]
-        sample_metadata = collective_form[SampleMetadata.SHEET_NAME]
-        starting_bravo = collective_form[BravoStart.SHEET_NAME]
-
         try:
-            row = clean_single_row(
-                bravo_rna, BravoRNAExtraction.QPCR_PLATE_BARCODE, self.pcr_barcode,
+            row = collective_form.single_row(
+                BravoRNAExtraction.SHEET_NAME,
+                BravoRNAExtraction.QPCR_PLATE_BARCODE,
+                self.pcr_barcode,
             )
         except MetadataNotFoundError:
-            rerun_row = clean_single_row(
-                bravo_rerun, RNARerun.QPCR_PLATE_BARCODE, self.pcr_barcode,
+            rerun_row = collective_form.single_row(
+                RNARerun.SHEET_NAME, RNARerun.QPCR_PLATE_BARCODE, self.pcr_barcode,
             )
 
             rna_barcode = rerun_row[RNARerun.RNA_PLATE_BARCODE]
-            self.bravo_rerun_notes = self._format_sheet_note(rerun_row)
+            self.bravo_rerun_notes = _format_sheet_note(rerun_row)
 
-            row = clean_single_row(bravo_rna, RNARerun.RNA_PLATE_BARCODE, rna_barcode,)
+            row = collective_form.single_row(
+                BravoRNAExtraction.SHEET_NAME, RNARerun.RNA_PLATE_BARCODE, rna_barcode,
+            )
 
         self.rna_barcode = row[BravoRNAExtraction.RNA_PLATE_BARCODE]
         self.sample_barcode = row[BravoRNAExtraction.SAMPLE_PLATE_BARCODE]
         self.researcher = row[BravoRNAExtraction.CLIAHUB_RESEARCHER]
         self.bravo_station = row[BravoRNAExtraction.BRAVO_STATION]
-        self.bravo_rna_notes = self._format_sheet_note(row)
+        self.bravo_rna_notes = _format_sheet_note(row)
 
         try:
-            sample_metadata_row = clean_single_row(
-                sample_metadata,
+            sample_metadata_row = collective_form.single_row(
+                SampleMetadata.SHEET_NAME,
                 SampleMetadata.SAMPLE_PLATE_BARCODE,
                 self.sample_barcode,
             )
         except MetadataNotFoundError:
             ...
         else:
-            self.sample_type = SamplePlateType(
-                sample_metadata_row[SampleMetadata.SAMPLE_TYPE]
+            self.sample_type = _parse_enum(
+                _SAMPLE_TYPE_BY_VALUE,
+                sample_metadata_row[SampleMetadata.SAMPLE_TYPE],
+                SamplePlateType,
             )
             self.experimental_run = self.sample_type != SamplePlateType.ORIGINAL
 
-            self.sample_plate_metadata_notes = self._format_sheet_note(
-                sample_metadata_row
-            )
-            self.controls_type = ControlsMappingType(
-                sample_metadata_row[SampleMetadata.CONTROLS_TYPE]
+            self.sample_plate_metadata_notes = _format_sheet_note(sample_metadata_row)
+            self.controls_type = _parse_enum(
+                _CONTROLS_BY_VALUE,
+                sample_metadata_row[SampleMetadata.CONTROLS_TYPE],
+                ControlsMappingType,
             )
 
             self.sample_source = sample_metadata_row[SampleMetadata.SAMPLE_SOURCE]
 
         try:
-            starting_bravo_row = clean_single_row(
-                starting_bravo,
+            starting_bravo_row = collective_form.single_row(
+                BravoStart.SHEET_NAME,
                 BravoStart.SAMPLE_PLATE_BARCODE,
                 self.sample_barcode,
                 -1,
@@ -141,8 +215,10 @@ class BravoMetadata:
         except MetadataNotFoundError:
             ...
         else:
-            bravo_sample_type = SamplePlateType(
-                starting_bravo_row[BravoStart.SAMPLE_TYPE]
+            bravo_sample_type = _parse_enum(
+                _SAMPLE_TYPE_BY_VALUE,
+                starting_bravo_row[BravoStart.SAMPLE_TYPE],
+                SamplePlateType,
             )
             self.experimental_run |= bravo_sample_type != SamplePlateType.ORIGINAL
 
@@ -150,60 +226,72 @@ class BravoMetadata:
             self.experimental_run |= self.extraction_version not in SOP_EXTRACTIONS
 
             self.rna_description = starting_bravo_row[BravoStart.DESCRIPTION]
-            self.starting_bravo_notes = self._format_sheet_note(starting_bravo_row)
-
-        self._parse_qpcr_metadata(qpcr_metadata)
-
-        logger.info(
-            msg=f"Parsed metadata - "
-            f"RNA Barcode: {self.rna_barcode}, "
-            f"Sample Barcode: {self.sample_barcode}, "
-            f"Researcher ID: {self.researcher}, "
-            f"Extraction version: {self.extraction_version}, "
-            f"Sample Type: {self.sample_type}, "
-            f"Experimental Run: {self.experimental_run}, "
-            f"Bravo Station ID: {self.bravo_station}, "
-            f"qPCR Station ID: {self.qpcr_station}, "
-            f"Sample Plate Metadata notes: {self.sample_plate_metadata_notes}, "
-            f"Starting Bravo notes: {self.starting_bravo_notes}, "
-            f"Extraction description: {self.rna_description}, "
-            f"Bravo RNA notes: {self.bravo_rna_notes}, "
-            f"qPCR notes: {self.qpcr_notes}, "
-            f"qPCR description: {self.qpcr_description}, "
-            f"Controls Type: {self.controls_type}"
-        )
-
-    @staticmethod
-    def _format_sheet_note(row):
-        body = row[Base.NOTES]
-        if body and body.strip():
-            timestamp = row[Base.TIMESTAMP]
-            researcher = row[Base.RESEARCHER_NAME]
-            return ReportNote(body.strip(), timestamp, researcher)
-        else:
-            return None
+            self.starting_bravo_notes = _format_sheet_note(starting_bravo_row)
+
+        self._parse_qpcr_metadata(collective_form)
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Parsed metadata - "
+                "RNA Barcode: %s, "
+                "Sample Barcode: %s, "
+                "Researcher ID: %s, "
+                "Extraction version: %s, "
+                "Sample Type: %s, "
+                "Experimental Run: %s, "
+                "Bravo Station ID: %s, "
+                "qPCR Station ID: %s, "
+                "Sample Plate Metadata notes: %s, "
+                "Starting Bravo notes: %s, "
+                "Extraction description: %s, "
+                "Bravo RNA notes: %s, "
+                "qPCR notes: %s, "
+                "qPCR description: %s, "
+                "Controls Type: %s",
+                self.rna_barcode,
+                self.sample_barcode,
+                self.researcher,
+                self.extraction_version,
+                self.sample_type,
+                self.experimental_run,
+                self.bravo_station,
+                self.qpcr_station,
+                self.sample_plate_metadata_notes,
+                self.starting_bravo_notes,
+                self.rna_description,
+                self.bravo_rna_notes,
+                self.qpcr_notes,
+                self.qpcr_description,
+                self.controls_type,
+            )
 
-    def _parse_qpcr_metadata(self, qpcr_metadata):
-        row = clean_single_row(
-            qpcr_metadata, QPCRMetadata.QPCR_PLATE_BARCODE, self.pcr_barcode,
+    def _parse_qpcr_metadata(self, collective_form: CollectiveForm):
+        row = collective_form.single_row(
+            QPCRMetadata.SHEET_NAME, QPCRMetadata.QPCR_PLATE_BARCODE, self.pcr_barcode,
         )
 
         self.qpcr_station = row[QPCRMetadata.QPCR_STATION]
         self.sop_protocol = row[QPCRMetadata.PROTOCOL]
         self.qpcr_description = row[QPCRMetadata.DESCRIPTION]
-        self.qpcr_notes = BravoMetadata._format_sheet_note(row)
+        self.qpcr_notes = _format_sheet_note(row)
 
 
 class qPCRData:
     """qPCR metadata and data"""
 
     data_fields = ["Well", "Fluor", "Cq"]
+    data_dtypes = {"Well": str, "Fluor": str, "Cq": float}
 
     PLTD_FILENAME = "Plate Setup File Name"
     PRCL_FILENAME = "Protocol File Name"
 
     RUN_ENDED = "Run Ended"
 
+    # the run information fields that are used
+    run_info_fields = frozenset((PLTD_FILENAME, PRCL_FILENAME, RUN_ENDED))
+
+    __slots__ = ("barcode", "metadata", "_quant_cq_results", "_data")
+
     def __init__(
         self,
         protocol: Protocol,
@@ -214,32 +302,41 @@ class qPCRData:
         self.barcode = barcode
         self.metadata = run_info
         self._quant_cq_results = quant_cq_results
-        logger.info(msg=f"Initializing qPCR_Metadata for Barcode: {self.barcode}")
+        self._data = None
+        logger.info("Initializing qPCR_Metadata for Barcode: %s", self.barcode)
 
         prcl_filename = self.metadata[qPCRData.PRCL_FILENAME]
         if prcl_filename != protocol.prcl_file:
             raise MismatchError(f"Mismatched qpcr protocol: {prcl_filename}")
         else:
-            logger.info(f"Using qpcr protocol: {prcl_filename}")
+            logger.info("Using qpcr protocol: %s", prcl_filename)
 
         pltd_filename = self.metadata[qPCRData.PLTD_FILENAME]
         if pltd_filename != protocol.pltd_file:
             raise MismatchError(f"Mismatched plate layout: {pltd_filename}")
         else:
-            logger.info(f"Using plate layout: {pltd_filename}")
+            logger.info("Using plate layout: %s", pltd_filename)
 
     @property
     def run_ended(self):
         return self.metadata[qPCRData.RUN_ENDED]
 
     @property
-    def data(self):
-        data = defaultdict(dict)
-        fields = qPCRData.data_fields
-        for r in self._quant_cq_results[fields].itertuples():
-            # get well and multiple fluor/cq values
-            well = r.Well
-            fluor = Fluor(r.Fluor)
-            cq = r.Cq
-            data[well][fluor] = cq
-        return data
+    def data(self) -> Dict[str, Dict[Fluor, float]]:
+        if self._data is None:
+            quant_cq = self._quant_cq_results
+            # get well and multiple fluor/cq values, one column at a time
+            wells = quant_cq["Well"].tolist()
+            fluors = (
+                quant_cq["Fluor"]
+                .map(functools.partial(_parse_enum, _FLUOR_BY_VALUE, enum_type=Fluor))
+                .tolist()
+            )
+            cqs = quant_cq["Cq"].tolist()
+
+            data = {well: {} for well in quant_cq["Well"].unique()}
+            for well, fluor, cq in zip(wells, fluors, cqs):
+                data[well][fluor] = cq
+            self._data = data
+
+        return self._data
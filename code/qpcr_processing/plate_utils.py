@@ -1,20 +1,36 @@
-from collections import defaultdict
+import functools
 
 from covidhub.constants import MAP_96_TO_384_PADDED
 
 
+@functools.lru_cache(maxsize=None)
+def _plan_384_to_96(mapping_items):
+    """
+    Flatten a protocol mapping into (96-well, gene, 384-well, fluor) tuples, in the
+    same order that map_384_to_96 fills in its results. ``mapping_items`` is the
+    mapping as nested tuples, so that it can be cached.
+    """
+    return tuple(
+        (well_id, gene, wells_384[position], fluor)
+        for well_id, wells_384 in MAP_96_TO_384_PADDED.items()
+        for fluor, positions in mapping_items
+        for position, gene in positions
+    )
+
+
 def map_384_to_96(data, mapping):
     """
     Convert 384 format to 96 format. This means mapping from four wells on a 384-well to
     the original well on a 96-well plate. We use the codes A1, A2, B1, B2 to refer to
     the relative locations of the four wells.
     """
-    results = defaultdict(dict)
+    plan = _plan_384_to_96(
+        tuple((fluor, tuple(positions.items())) for fluor, positions in mapping.items())
+    )
+
+    results = {well_id: {} for well_id in MAP_96_TO_384_PADDED}
 
-    for well_id in MAP_96_TO_384_PADDED:
-        for fluor in mapping:
-            for position, gene in mapping[fluor].items():
-                cq = data[MAP_96_TO_384_PADDED[well_id][position]][fluor]
-                results[well_id][gene] = cq
+    for well_id, gene, well_384, fluor in plan:
+        results[well_id][gene] = data[well_384][fluor]
 
     return results
@@ -1,9 +1,16 @@
 import csv
+import functools
 import io
 import logging
 import pathlib
 from collections import defaultdict
-from typing import Dict
+from concurrent.futures import (
+    as_completed,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Dict, Iterable, List, Set, Tuple
 
 import pandas as pd
 from google.oauth2 import service_account
@@ -12,6 +19,7 @@ import covidhub.google.utils as gutils
 import qpcr_processing.accession as accession
 from covidhub.collective_form import CollectiveForm
 from covidhub.config import Config, get_git_info
+from covidhub.constants import MAP_96_TO_384_NO_PAD, MappedWell
 from covidhub.constants.qpcr_forms import SampleMetadata, SampleRerun
 from covidhub.google import drive, mail
 from covidhub.logging import create_logger
@@ -49,6 +57,18 @@ CLIAHUB Bot
     return body
 
 
+def _quant_amp_columns(positions: Iterable[MappedWell]) -> Set[str]:
+    """The columns of a quant amp file that are needed to plot the given positions"""
+    return {
+        "Cycle",
+        *(
+            wells_384[position]
+            for wells_384 in MAP_96_TO_384_NO_PAD.values()
+            for position in positions
+        ),
+    }
+
+
 def process_barcode(
     cfg: Config,
     barcode: str,
@@ -62,15 +82,28 @@ def process_barcode(
 
     # read in the run information and quant cq
     with barcode_files.run_info.open("r") as fh:
-        run_info = dict(csv.reader(fh))
+        run_info = {
+            key: value
+            for key, value in csv.reader(fh)
+            if key in qPCRData.run_info_fields
+        }
 
     with barcode_files.quant_cq.open("r") as fh:
-        quant_cq_results = pd.read_csv(fh, sep=",")
+        quant_cq_results = pd.read_csv(
+            fh, sep=",", usecols=qPCRData.data_fields, dtype=qPCRData.data_dtypes
+        )
 
+    # only read the amplification data for the wells used by the protocol
     quant_amp_data = {}
     for fluor, quant_amp_file in barcode_files.quant_amp.items():
+        if fluor not in protocol.mapping:
+            continue
+
+        amp_columns = _quant_amp_columns(protocol.mapping[fluor])
         with quant_amp_file.open("r") as fh:
-            quant_amp_data[fluor] = pd.read_csv(fh, sep=",")
+            quant_amp_data[fluor] = pd.read_csv(
+                fh, sep=",", usecols=amp_columns.__contains__
+            )
 
     qPCR_data = qPCRData(protocol, barcode, run_info, quant_cq_results)
 
@@ -95,48 +128,74 @@ def process_barcode(
     return processing_results
 
 
-def processing(cfg: Config, google_credentials: service_account.Credentials):
-    git_info = get_git_info()
+# ids of the configured folders, which don't change while a (warm) lambda is running
+_FOLDER_IDS: Dict[Tuple[str, ...], str] = {}
+
+
+def _get_folder_id(
+    google_credentials: service_account.Credentials, path_components: List[str]
+) -> str:
+    """
+    Resolve a folder path to an ID, with a Drive service for the calling thread. The
+    id is cached for later runs.
+    """
+    key = tuple(path_components)
+    if key not in _FOLDER_IDS:
+        drive_service = drive.get_service(google_credentials)
+        _FOLDER_IDS[key] = drive.get_folder_id_of_path(drive_service, path_components)
+    return _FOLDER_IDS[key]
+
+
+def _get_folder_contents(
+    google_credentials: service_account.Credentials, path_components: List[str]
+) -> Tuple[str, List[drive.DriveObject]]:
+    """
+    Resolve a folder path to an ID and list the files in it, with a Drive service for
+    the calling thread
+    """
+    folder_id = _get_folder_id(google_credentials, path_components)
     drive_service = drive.get_service(google_credentials)
-    logger.info(msg=f"Starting processing loop with code version: {git_info}")
-
-    # qpcr logs folder
-    logs_folder_id = drive.get_folder_id_of_path(drive_service, cfg.PCR_LOGS_FOLDER)
-
-    # markers folder
-    markers_folder_id = drive.get_folder_id_of_path(
-        drive_service, cfg.PCR_MARKERS_FOLDER
+    contents = drive.get_contents_by_folder_id(
+        drive_service, folder_id, only_files=True
     )
+    return folder_id, contents
 
-    # csv results folder
-    csv_results_folder_id = drive.get_folder_id_of_path(
-        drive_service, cfg.CSV_RESULTS_FOLDER
-    )
 
-    # CB rad results folder
-    cb_report_folder_id = drive.get_folder_id_of_path(
-        drive_service, cfg.CHINA_BASIN_CSV_REPORTS_FOLDER
-    )
+def processing(cfg: Config, google_credentials: service_account.Credentials):
+    git_info = get_git_info()
+    drive_service = drive.get_service(google_credentials)
+    logger.info(msg=f"Starting processing loop with code version: {git_info}")
 
-    # final reports folder
-    final_results_folder_id = drive.get_folder_id_of_path(
-        drive_service, cfg.FINAL_REPORTS_FOLDER
-    )
+    # each folder lookup and listing is a Drive round trip, so run them concurrently
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        logs_folder = executor.submit(
+            _get_folder_contents, google_credentials, cfg.PCR_LOGS_FOLDER
+        )
+        markers_folder = executor.submit(
+            _get_folder_contents, google_credentials, cfg.PCR_MARKERS_FOLDER
+        )
+        (
+            csv_results_folder_id,
+            cb_report_folder_id,
+            final_results_folder_id,
+            plate_layout_folder_id,
+        ) = executor.map(
+            functools.partial(_get_folder_id, google_credentials),
+            (
+                cfg.CSV_RESULTS_FOLDER,
+                cfg.CHINA_BASIN_CSV_REPORTS_FOLDER,
+                cfg.FINAL_REPORTS_FOLDER,
+                cfg.PLATE_LAYOUT_FOLDER,
+            ),
+        )
+        _, logs_folder_contents = logs_folder.result()
+        markers_folder_id, marker_folder_contents = markers_folder.result()
 
     # get the collection spreadsheet
     collective_form = CollectiveForm(
         drive_service, cfg["DATA"]["collection_form_spreadsheet_id"]
     )
 
-    logs_folder_contents = drive.get_contents_by_folder_id(
-        drive_service, logs_folder_id, only_files=True
-    )
-    marker_folder_contents = drive.get_contents_by_folder_id(
-        drive_service, markers_folder_id, only_files=True
-    )
-    plate_layout_folder_id = drive.get_folder_id_of_path(
-        drive_service, cfg.PLATE_LAYOUT_FOLDER
-    )
     completed_barcodes = set(
         marker_folder_entry.name for marker_folder_entry in marker_folder_contents
     )
@@ -149,120 +208,177 @@ def processing(cfg: Config, google_credentials: service_account.Credentials):
 
     barcodes_to_process = defaultdict(RunFiles)
     for entry in logs_folder_contents:
+        # skip the files of completed barcodes before matching the full file name
+        if RunFiles.extract_barcode_fast(entry.name) in completed_barcodes:
+            continue
         m = RunFiles.get_qpcr_file_type(entry.name)
         if m is None or m[RunFiles.BARCODE] in completed_barcodes:
             continue
         else:
             barcodes_to_process[m[RunFiles.BARCODE]].add_file(m, entry)
 
-    for barcode, barcode_files in barcodes_to_process.items():
-        # all files must be present, at least one quant_amp file
-        if not barcode_files.all_files:
-            message = f"Missing files for: {barcode}. Skipping for now"
-            logger.critical(msg=message, extra={"notify_slack": True})
-            continue
+    # Drive uploads and emails for a barcode run while the next one is processed
+    with ThreadPoolExecutor(max_workers=4) as io_pool:
+        futures = []
 
-        try:
-            logger.info(msg=f"Found sample to process, barcode: {barcode}")
-
-            logger.info(msg=f"Getting metadata and data for: {barcode}")
-            bravo_metadata = BravoMetadata.load_from_spreadsheet(
-                barcode, collective_form,
-            )
-            if bravo_metadata.sop_protocol is None:
-                message = f"Skipping sample plate: {barcode}, no protocol"
+        for barcode, barcode_files in barcodes_to_process.items():
+            # all files must be present, at least one quant_amp file
+            if not barcode_files.all_files:
+                message = f"Missing files for: {barcode}. Skipping for now"
                 logger.critical(msg=message, extra={"notify_slack": True})
                 continue
 
-            protocol = get_protocol(bravo_metadata.sop_protocol)
-
-            if not set(barcode_files.quant_amp).issuperset(protocol.mapping):
-                missing = map(str, set(protocol.mapping) - set(barcode_files.quant_amp))
-                message = f"Missing quant amp files for {barcode}: {', '.join(missing)}"
-                logger.critical(msg=message, extra={"notify_slack": True})
-                continue
+            try:
+                logger.info(msg=f"Found sample to process, barcode: {barcode}")
+
+                logger.info(msg=f"Getting metadata and data for: {barcode}")
+                bravo_metadata = BravoMetadata.load_from_spreadsheet(
+                    barcode, collective_form,
+                )
+                if bravo_metadata.sop_protocol is None:
+                    message = f"Skipping sample plate: {barcode}, no protocol"
+                    logger.critical(msg=message, extra={"notify_slack": True})
+                    continue
+
+                protocol = get_protocol(bravo_metadata.sop_protocol)
+
+                missing = protocol.mapping.keys() - barcode_files.quant_amp.keys()
+                if missing:
+                    missing = map(str, missing)
+                    message = (
+                        f"Missing quant amp files for {barcode}: {', '.join(missing)}"
+                    )
+                    logger.critical(msg=message, extra={"notify_slack": True})
+                    continue
+
+                # process well data and check controls, return results
+                logger.info(msg=f"Processing well data and controls for: {barcode}")
+                accession_data = accession.get_accession_data_with_rerun(
+                    drive_service,
+                    plate_layout_folder_id,
+                    sample_metadata_form,
+                    rerun_form,
+                    bravo_metadata.sample_barcode,
+                )
+
+                control_wells = get_control_wells_from_type(
+                    controls_type=bravo_metadata.controls_type,
+                    accession_data=accession_data,
+                )
+                update_accession_data_with_controls(
+                    control_wells, accession_data, barcode
+                )
+
+                processing_results = process_barcode(
+                    cfg,
+                    barcode,
+                    barcode_files,
+                    bravo_metadata,
+                    protocol,
+                    control_wells,
+                    accession_data,
+                )
+
+                # create pdf report
+                logger.info(msg=f"Generating results PDF for: {barcode}")
+                final_pdf = io.BytesIO()
+                create_final_pdf(processing_results, final_pdf)
+
+                # upload and notify in the background while the next barcode is
+                # processed
+                futures.append(
+                    io_pool.submit(
+                        _upload_results,
+                        cfg,
+                        google_credentials,
+                        git_info,
+                        processing_results,
+                        final_pdf,
+                        csv_results_folder_id,
+                        cb_report_folder_id,
+                        final_results_folder_id,
+                        markers_folder_id,
+                    )
+                )
+
+            except Exception as err:
+                logger.critical(
+                    f"Error in [{cfg.aws_env}]: {err}", extra={"notify_slack": True}
+                )
+                logger.exception("Details:")
+
+        wait(futures)
+
+
+def _upload_results(
+    cfg: Config,
+    google_credentials: service_account.Credentials,
+    git_info: str,
+    processing_results: ProcessingResults,
+    final_pdf: io.BytesIO,
+    csv_results_folder_id: str,
+    cb_report_folder_id: str,
+    final_results_folder_id: str,
+    markers_folder_id: str,
+):
+    """
+    Upload the results files and PDF for a barcode, send the email report and write
+    the marker file. The marker is only written once everything else has succeeded.
+    """
+    barcode = processing_results.bravo_metadata.pcr_barcode
+    sample_barcode = processing_results.bravo_metadata.sample_barcode
 
-            # process well data and check controls, return results
-            logger.info(msg=f"Processing well data and controls for: {barcode}")
-            accession_data = accession.get_accession_data_with_rerun(
-                drive_service,
-                plate_layout_folder_id,
-                sample_metadata_form,
-                rerun_form,
-                bravo_metadata.sample_barcode,
-            )
+    try:
+        # the http client of a service is not thread-safe, so build one for this thread
+        drive_service = drive.get_service(google_credentials)
 
-            control_wells = get_control_wells_from_type(
-                controls_type=bravo_metadata.controls_type,
-                accession_data=accession_data,
-            )
-            update_accession_data_with_controls(control_wells, accession_data, barcode)
+        with drive.put_file(
+            drive_service, csv_results_folder_id, processing_results.results_filename,
+        ) as fh:
+            processing_results.write_results(fh)
 
-            processing_results = process_barcode(
-                cfg,
-                barcode,
-                barcode_files,
-                bravo_metadata,
-                protocol,
-                control_wells,
-                accession_data,
-            )
+        china_basin_result_file = drive.put_file(
+            drive_service, cb_report_folder_id, processing_results.cb_report_filename,
+        )
+        with china_basin_result_file as fh:
+            processing_results.write_cb_report(fh)
 
-            with drive.put_file(
-                drive_service,
-                csv_results_folder_id,
-                processing_results.results_filename,
-            ) as fh:
-                processing_results.write_results(fh)
-
-            china_basin_result_file = drive.put_file(
-                drive_service,
-                cb_report_folder_id,
-                processing_results.cb_report_filename,
-            )
-            with china_basin_result_file as fh:
-                processing_results.write_cb_report(fh)
-
-            # create pdf report
-            logger.info(msg=f"Generating and uploading results PDF for: {barcode}")
-            final_pdf = io.BytesIO()
-            create_final_pdf(processing_results, final_pdf)
-            pdf_results_file = drive.put_file(
-                drive_service,
-                final_results_folder_id,
-                processing_results.final_pdf_filename,
-            )
-            with pdf_results_file as out_fh:
-                out_fh.write(final_pdf.getvalue())
-
-            logger.info(msg=f"Sending email report: {barcode}")
-            mail.send_email(
-                google_credentials,
-                sender=cfg["EMAIL"].get("sender"),
-                recipients=cfg["EMAIL"].get("recipients"),
-                subject=_format_email_subject(
-                    sample_barcode=bravo_metadata.sample_barcode, qpcr_barcode=barcode,
-                ),
-                body=_format_email_body(
-                    sample_barcode=bravo_metadata.sample_barcode,
-                    results_file_id=china_basin_result_file.id,
-                ),
-                attachments={processing_results.final_pdf_filename: final_pdf},
-            )
+        logger.info(msg=f"Uploading results PDF for: {barcode}")
+        pdf_results_file = drive.put_file(
+            drive_service,
+            final_results_folder_id,
+            processing_results.final_pdf_filename,
+        )
+        with pdf_results_file as out_fh:
+            out_fh.write(final_pdf.getvalue())
+
+        logger.info(msg=f"Sending email report: {barcode}")
+        mail.send_email(
+            google_credentials,
+            sender=cfg["EMAIL"].get("sender"),
+            recipients=cfg["EMAIL"].get("recipients"),
+            subject=_format_email_subject(
+                sample_barcode=sample_barcode, qpcr_barcode=barcode,
+            ),
+            body=_format_email_body(
+                sample_barcode=sample_barcode,
+                results_file_id=china_basin_result_file.id,
+            ),
+            attachments={processing_results.final_pdf_filename: final_pdf},
+        )
 
-            message = (
-                f"Processed sample plate: {bravo_metadata.sample_barcode}-{barcode}"
-                f" using rev {git_info}"
-            )
-            logger.critical(msg=message, extra={"notify_slack": True})
-            # write a marker so we don't process this file again.
-            processing_results.write_marker_file(drive_service, markers_folder_id)
+        message = (
+            f"Processed sample plate: {sample_barcode}-{barcode} using rev {git_info}"
+        )
+        logger.critical(msg=message, extra={"notify_slack": True})
+        # write a marker so we don't process this file again.
+        processing_results.write_marker_file(drive_service, markers_folder_id)
 
-        except Exception as err:
-            logger.critical(
-                f"Error in [{cfg.aws_env}]: {err}", extra={"notify_slack": True}
-            )
-            logger.exception("Details:")
+    except Exception as err:
+        logger.critical(
+            f"Error in [{cfg.aws_env}]: {err}", extra={"notify_slack": True}
+        )
+        logger.exception("Details:")
 
 
 def local_processing(data, control_wells, protocol: Protocol):
@@ -284,6 +400,24 @@ def local_processing(data, control_wells, protocol: Protocol):
     return results
 
 
+def _write_local_results(processing_results: ProcessingResults, run_path: pathlib.Path):
+    """Write the results files and the PDF report for a processed barcode"""
+    results_path = run_path / processing_results.results_filename
+    with ProcessingResults.open_output(results_path) as fh:
+        processing_results.write_results(fh)
+
+    cb_report_path = run_path / processing_results.cb_report_filename
+    with ProcessingResults.open_output(cb_report_path) as fh:
+        processing_results.write_cb_report(fh)
+
+    # create pdf report
+    barcode = processing_results.bravo_metadata.pcr_barcode
+    logger.info(msg=f"Generating results PDF for: {barcode}")
+    final_pdf_filename = run_path / processing_results.final_pdf_filename
+    with open(final_pdf_filename, "wb") as output_file:
+        create_final_pdf(processing_results, output_file)
+
+
 def parse_qpcr_csv(args):
     cfg = Config()
     create_logger(cfg, debug=args.debug)
@@ -330,77 +464,81 @@ def parse_qpcr_csv(args):
         else:
             barcodes_to_process[m[RunFiles.BARCODE]].add_file(m, run_file)
 
-    for barcode, barcode_files in barcodes_to_process.items():
-        # all files must be present, at least one quant_amp file
-        if not barcode_files.all_files:
-            message = f"Missing files for: {barcode}. Skipping for now"
-            logger.info(msg=message)
-            continue
+    # writing the reports, mostly rendering the PDF, is done in worker processes
+    with ProcessPoolExecutor() as executor:
+        futures = []
+        for barcode, barcode_files in barcodes_to_process.items():
+            # all files must be present, at least one quant_amp file
+            if not barcode_files.all_files:
+                message = f"Missing files for: {barcode}. Skipping for now"
+                logger.info(msg=message)
+                continue
 
-        logger.info(msg=f"Found sample to process, barcode: {barcode}")
+            logger.info(msg=f"Found sample to process, barcode: {barcode}")
 
-        logger.info(msg=f"Getting metadata and data for: {barcode}")
-        bravo_metadata = BravoMetadata.load_from_spreadsheet(barcode, collective_form)
-        if args.protocol is not None:
-            # user specified the protocol
-            protocol = get_protocol(args.protocol)
-        else:
-            protocol = get_protocol(bravo_metadata.sop_protocol)
+            logger.info(msg=f"Getting metadata and data for: {barcode}")
+            bravo_metadata = BravoMetadata.load_from_spreadsheet(
+                barcode, collective_form
+            )
+            if args.protocol is not None:
+                # user specified the protocol
+                protocol = get_protocol(args.protocol)
+            else:
+                protocol = get_protocol(bravo_metadata.sop_protocol)
+
+            missing = protocol.mapping.keys() - barcode_files.quant_amp.keys()
+            if missing:
+                missing = map(str, missing)
+                message = f"Missing quant amp files for {barcode}: {', '.join(missing)}"
+                logger.critical(msg=message)
+                continue
 
-        if not set(barcode_files.quant_amp).issuperset(protocol.mapping):
-            missing = map(str, set(protocol.mapping) - set(barcode_files.quant_amp))
-            message = f"Missing quant amp files for {barcode}: {', '.join(missing)}"
-            logger.critical(msg=message)
-            continue
+            if args.plate_map_file is not None:
+                plate_map_type = accession.get_plate_map_type_from_name(
+                    args.plate_map_file.name
+                )
+                accession_data = accession.read_accession_data(
+                    plate_map_type, args.plate_map_file
+                )
+            elif args.use_gdrive:
+                accession_data = accession.get_accession_data_with_rerun(
+                    drive_service,
+                    plate_layout_folder_id,
+                    sample_metadata_form,
+                    rerun_form,
+                    bravo_metadata.sample_barcode,
+                )
+            else:
+                raise ValueError(
+                    "You must provide a plate map file or use Google Drive"
+                )
 
-        if args.plate_map_file is not None:
-            plate_map_type = accession.get_plate_map_type_from_name(
-                args.plate_map_file.name
-            )
-            accession_data = accession.read_accession_data(
-                plate_map_type, args.plate_map_file
-            )
-        elif args.use_gdrive:
-            accession_data = accession.get_accession_data_with_rerun(
-                drive_service,
-                plate_layout_folder_id,
-                sample_metadata_form,
-                rerun_form,
-                bravo_metadata.sample_barcode,
+            control_wells = get_control_wells_from_type(
+                controls_type=bravo_metadata.controls_type,
+                accession_data=accession_data,
             )
-        else:
-            raise ValueError("You must provide a plate map file or use Google Drive")
+            # check for valid accessions
+            update_accession_data_with_controls(control_wells, accession_data, barcode)
 
-        control_wells = get_control_wells_from_type(
-            controls_type=bravo_metadata.controls_type, accession_data=accession_data,
-        )
-        # check for valid accessions
-        update_accession_data_with_controls(control_wells, accession_data, barcode)
-
-        # process well data and check controls, return results
-        logger.info(msg=f"Processing well data and controls for: {barcode}")
-
-        processing_results = process_barcode(
-            cfg,
-            barcode,
-            barcode_files,
-            bravo_metadata,
-            protocol,
-            control_wells,
-            accession_data,
-        )
+            # process well data and check controls, return results
+            logger.info(msg=f"Processing well data and controls for: {barcode}")
 
-        with (run_path / processing_results.results_filename).open("w") as fh:
-            processing_results.write_results(fh)
+            processing_results = process_barcode(
+                cfg,
+                barcode,
+                barcode_files,
+                bravo_metadata,
+                protocol,
+                control_wells,
+                accession_data,
+            )
 
-        with (run_path / processing_results.cb_report_filename).open("w") as fh:
-            processing_results.write_cb_report(fh)
+            futures.append(
+                executor.submit(_write_local_results, processing_results, run_path)
+            )
 
-        # create pdf report
-        logger.info(msg=f"Generating results PDF for: {barcode}")
-        final_pdf_filename = run_path / processing_results.final_pdf_filename
-        with open(final_pdf_filename, "wb") as output_file:
-            create_final_pdf(processing_results, output_file)
+        for future in as_completed(futures):
+            future.result()
 
 
 def lambda_handler(event, context):
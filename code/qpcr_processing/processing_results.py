@@ -1,14 +1,25 @@
 from __future__ import annotations
 
 import csv
+import functools
+import io
 import logging
+import math
+import pathlib
 import re
-from typing import Dict, Optional, TextIO
+from typing import Dict, Optional, TextIO, Union
 
 import dateutil
 
 from covidhub.config import Config
-from covidhub.constants import Call, COLS_96, ControlType, ROWS_96, VALID_ACCESSION
+from covidhub.constants import (
+    Call,
+    COLS_96,
+    ControlType,
+    ROWS_96,
+    VALID_ACCESSION,
+    WELL_ID_GRID,
+)
 from covidhub.google import drive
 from qpcr_processing.metadata import BravoMetadata
 from qpcr_processing.protocol import Protocol
@@ -16,6 +27,17 @@ from qpcr_processing.well_results import WellResults
 
 logger = logging.getLogger(__name__)
 
+_VALID_ACCESSION_RE = re.compile(VALID_ACCESSION)
+
+# buffer size for writing results files, which are small enough to be written at once
+OUTPUT_BUFFER_SIZE = 1 << 17
+
+
+@functools.lru_cache(maxsize=8)
+def _get_tz(name: str):
+    """look up a timezone by name, once per name"""
+    return dateutil.tz.gettz(name)
+
 
 class ProcessingResults:
     """
@@ -64,9 +86,10 @@ class ProcessingResults:
 
     def invalid_accessions(self):
         """Make sure all accessions match the VALID_ACCESSION regex"""
+        valid_accession = _VALID_ACCESSION_RE.fullmatch
         for well_id, well_result in self.well_results.items():
             if well_result.accession and well_result.control_type is None:
-                if re.fullmatch(VALID_ACCESSION, well_result.accession) is None:
+                if valid_accession(well_result.accession) is None:
                     logger.critical(
                         f"{self.combined_barcode} has an invalid accession in "
                         f"{well_id}: '{well_result.accession}'",
@@ -108,43 +131,43 @@ class ProcessingResults:
 
     def add_metadata_to_file(self, fh, metadata):
         """Add the metadata info to the open file"""
-        for label, value in metadata.items():
-            fh.write(f"{label},{value}\n")
-        fh.write("\n")
+        writer = csv.writer(fh, lineterminator="\n")
+        writer.writerows((label, str(value)) for label, value in metadata.items())
+        writer.writerow(())
 
     def add_plate_map_to_file(self, fh):
         """Add the plate map info to the open file"""
+        writer = csv.writer(fh, lineterminator="\n")
 
         # Add the platelayout data
-        print(",{}".format(",".join(str(c) for c in COLS_96)), file=fh)
+        writer.writerow(["", *COLS_96])
 
         # make plate map
-        for row in ROWS_96:
-            print(
-                "{},{}".format(
-                    row,
-                    ",".join(str(self.well_results[f"{row}{col}"]) for col in COLS_96),
-                ),
-                file=fh,
-            )
+        writer.writerows(
+            [row, *(str(self.well_results[WELL_ID_GRID[row, col]]) for col in COLS_96)]
+            for row in ROWS_96
+        )
 
-        print(file=fh)
+        writer.writerow(())
 
     def add_run_data_to_file(self, fh, include_cluster_warnings):
         """Add main processing results as a table to the open file"""
+        writer = csv.writer(fh, lineterminator="\n")
         # Add the run data
-        fh.write(",".join(self.protocol.formatted_row_header) + "\n")
+        writer.writerow(self.protocol.formatted_row_header)
         formatted_run_data = self.get_formatted_run_data(include_cluster_warnings)
-        for clean_result in formatted_run_data:
-            fh.write(",".join([str(e) for e in clean_result]) + "\n")
+        writer.writerows(map(str, clean_result) for clean_result in formatted_run_data)
 
     def write_cb_report(self, fh):
         logger.info(
             msg=f"Writing results data for: {self.combined_barcode} to: {fh.name}"
         )
-        self.add_metadata_to_file(fh, self.formatted_metadata_cb_results)
+        # build the report in memory so it reaches the file in a single write
+        buf = io.StringIO()
+        self.add_metadata_to_file(buf, self.formatted_metadata_cb_results)
         # Add the run data
-        self.add_run_data_to_file(fh, True)
+        self.add_run_data_to_file(buf, True)
+        fh.write(buf.getvalue())
 
     @property
     def station_id(self):
@@ -167,16 +190,27 @@ class ProcessingResults:
             "Testing Location": "CZ Biohub",
         }
 
+    @staticmethod
+    def open_output(path: Union[str, pathlib.Path]) -> TextIO:
+        """
+        Open a local file for write_results or write_cb_report, with a buffer large
+        enough to hold the whole file
+        """
+        return open(path, "w", buffering=OUTPUT_BUFFER_SIZE, newline="")
+
     def write_results(self, fh):
         logger.info(
             msg=f"Writing results data for: {self.combined_barcode} to: {fh.name}"
         )
+        # build the results in memory so they reach the file in a single write
+        buf = io.StringIO()
         # Add the metadata
-        self.add_metadata_to_file(fh, self.formatted_metadata)
+        self.add_metadata_to_file(buf, self.formatted_metadata)
         # Add the platelayout data
-        self.add_plate_map_to_file(fh)
+        self.add_plate_map_to_file(buf)
         # Add the run data
-        self.add_run_data_to_file(fh, False)
+        self.add_run_data_to_file(buf, False)
+        fh.write(buf.getvalue())
 
     def write_marker_file(self, drive_service, markers_folder_id):
         """Writes a marker file for the given results"""
@@ -189,9 +223,7 @@ class ProcessingResults:
     def format_time(timestamp: str, cfg: Config) -> str:
         """helper function to reformat UTC timestamp to the configured timezone"""
         # get timezone from config, use UTC if unavailable
-        timezone = dateutil.tz.gettz(
-            cfg["GENERAL"].get("timezone", "America/Los Angeles")
-        )
+        timezone = _get_tz(cfg["GENERAL"].get("timezone", "America/Los Angeles"))
 
         # parse UTC timestamp and convert to timezone
         dt = dateutil.parser.parse(timestamp).astimezone(timezone)
@@ -210,7 +242,7 @@ class ProcessingResults:
             filename,
             drive.FindMode.MOST_RECENTLY_MODIFIED,
         ) as fh:
-            ProcessingResults.from_results_file(fh=fh, protocol=protocol)
+            return ProcessingResults.from_results_file(fh=fh, protocol=protocol)
 
     @staticmethod
     def from_results_data(
@@ -286,6 +318,8 @@ class ProcessingResults:
         qpcr_station = None
         controls = None
         well_to_results_mapping: Dict[str, WellResults] = {}
+        gene_list = protocol.gene_list
+        nan = math.nan
 
         for row in reader:
             if len(row) == 0:
@@ -324,8 +358,7 @@ class ProcessingResults:
                     accession = row[1]
                     gene_cts = row[3:]
                     gene_values = {
-                        g: float(v) if v != "" else float("NaN")
-                        for g, v in zip(protocol.gene_list, gene_cts)
+                        g: float(v) if v else nan for g, v in zip(gene_list, gene_cts)
                     }
 
                     control_type = ControlType.parse_control(accession)
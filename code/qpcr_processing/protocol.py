@@ -1,10 +1,19 @@
+import functools
 import math
 from dataclasses import dataclass
-from typing import Dict, Optional, Sequence, Union
+from typing import Dict, Optional, Sequence, Tuple, Union
 
 import numpy as np
 
-from covidhub.constants import Call, ControlType, Fluor, MappedWell, SAMPLE
+from covidhub.constants import (
+    Call,
+    COLS_96,
+    ControlType,
+    Fluor,
+    MappedWell,
+    ROWS_96,
+    SAMPLE,
+)
 from qpcr_processing.well_results import WellResults
 
 Gene = str
@@ -27,20 +36,45 @@ def cq_thresholds(
     }
 
 
+# the (row, column) position of each well on a 96-well plate
+_WELL_POSITIONS = {
+    f"{row}{col}": (i, j)
+    for i, row in enumerate(ROWS_96)
+    for j, col in enumerate(COLS_96)
+}
+
+
+@functools.lru_cache(maxsize=16)
+def _neighbor_matrix(well_ids: Tuple[str, ...], radius: int) -> np.ndarray:
+    """
+    An (n, n) boolean matrix that is True where the second well is in the
+    (2r+1)x(2r+1) square around the first (including itself). Wells that are not on a
+    96-well plate have no neighbors. Every plate has the same wells in the same order,
+    so the matrix is cached per layout and radius, and is read-only.
+    """
+    on_plate = np.array([well_id in _WELL_POSITIONS for well_id in well_ids])
+    positions = np.array(
+        [_WELL_POSITIONS.get(well_id, (0, 0)) for well_id in well_ids], dtype=int
+    ).reshape(len(well_ids), 2)
+
+    distances = np.abs(positions[:, np.newaxis, :] - positions[np.newaxis, :, :])
+    neighbors = (
+        (distances.max(axis=2) <= radius)
+        & on_plate[:, np.newaxis]
+        & on_plate[np.newaxis, :]
+    )
+    neighbors.flags.writeable = False
+    return neighbors
+
+
 def get_protocol(protocol_name):
-    if protocol_name == SOP_V1.name:
-        return SOP_V1
-    elif protocol_name == SOP_V2.name:
-        return SOP_V2
-    elif protocol_name == UDGprotocol.name:
-        return UDGprotocol
-    elif protocol_name == SOP_V3.name:
-        return SOP_V3
-    else:
+    try:
+        return _PROTOCOLS_BY_NAME[protocol_name]
+    except KeyError:
         raise ValueError(f"Unknown protocol {protocol_name}")
 
 
-@dataclass
+@dataclass(frozen=True)
 class Protocol:
     """Dataclass for protocols. They should have all of these fields. Subclasses can
     overwrite to change the logic
@@ -57,28 +91,66 @@ class Protocol:
     radius: int = 1
     pos_cluster_cutoff: float = 10.0
 
+    def __post_init__(self):
+        # these only depend on the genes, so they are computed once per protocol. The
+        # dataclass is frozen, so they have to be set with object.__setattr__
+        set_attr = functools.partial(object.__setattr__, self)
+
+        gene_cutoffs = {
+            gene: gene_cutoffs
+            for gene_dict in (self.virus_genes, self.control_genes)
+            for gene, gene_cutoffs in gene_dict.items()
+        }
+        set_attr("_gene_cutoffs", gene_cutoffs)
+        set_attr("_gene_list", list(gene_cutoffs))
+
+        # WellResults.format_row writes the ct values in the order map_384_to_96
+        # fills them in, which is the order of the mapping. That has to match the
+        # header, or the ct columns would be mislabeled.
+        mapping_genes = [
+            gene for positions in self.mapping.values() for gene in positions.values()
+        ]
+        if mapping_genes != self._gene_list:
+            raise ValueError(
+                f"{self.name}: mapping gene order {mapping_genes} does not match"
+                f" gene order {self._gene_list}"
+            )
+        set_attr(
+            "_cutoff_table",
+            {
+                (gene, well_type): math.inf if cutoff is None else cutoff
+                for gene, cutoffs in gene_cutoffs.items()
+                for well_type, cutoff in cutoffs.items()
+            },
+        )
+        set_attr("_virus_gene_tuple", tuple(self.virus_genes))
+        set_attr("_virus_gene_set", frozenset(self.virus_genes))
+        set_attr("_control_gene_set", frozenset(self.control_genes))
+        set_attr("_n_virus_genes", len(self._virus_gene_set))
+        set_attr("_n_control_genes", len(self._control_gene_set))
+        set_attr(
+            "_formatted_row_header",
+            ["Well", "Accession", "Call", *(f"{gene} Ct" for gene in gene_cutoffs)],
+        )
+
     @staticmethod
     def isnan(v):
+        if isinstance(v, float):
+            # the usual case, NaN is the only float that is not equal to itself
+            return v != v
         return v == "NaN" or v == "" or math.isnan(v)
 
     @property
     def gene_cutoffs(self):
-        return {
-            gene: gene_cutoffs
-            for gene_dict in (self.virus_genes, self.control_genes)
-            for gene, gene_cutoffs in gene_dict.items()
-        }
+        return self._gene_cutoffs
 
     @property
     def gene_list(self):
-        return list(self.gene_cutoffs)
+        return self._gene_list
 
     @property
     def formatted_row_header(self):
-        header = ["Well", "Accession", "Call"]
-        header.extend(f"{gene} Ct" for gene in self.gene_list)
-
-        return header
+        return self._formatted_row_header
 
     def format_header_for_reports(self, start) -> Sequence[str]:
         formatted = [f"{gene} Ct" for gene in self.gene_list]
@@ -90,31 +162,37 @@ class Protocol:
         if self.isnan(v):
             # not detected at all
             return False
-        elif g not in self.gene_cutoffs:
-            # this gene is not part of the protocol
-            return False
-        elif self.gene_cutoffs[g][well_type] is None:
-            # if cutoff is None, any value passes cutoff
-            return True
-        elif float(v) >= self.gene_cutoffs[g][well_type]:
-            # if cutoff is not None, check if value is above cutoff
-            return False
-        elif float(v) < self.gene_cutoffs[g][well_type]:
-            # check if value is below cutoff, just in case
-            return True
-        else:
-            # who knows how this could happen
-            raise ValueError(f"Illegal Ct value {v}")
+
+        # the value passes if it is below the cutoff. A cutoff of None is stored as
+        # infinity so any value passes, and genes that are not part of the protocol
+        # get negative infinity so nothing passes
+        return float(v) < self._cutoff_table.get((g, well_type), -math.inf)
+
+    def _count_called(self, values, well_type) -> Tuple[int, int, int]:
+        """
+        Count the viral genes that were detected, and the viral and control genes that
+        are below their cutoff for the given well type
+        """
+        viral_detected = viral_called = control_called = 0
+        for g, v in values.items():
+            if self.isnan(v):
+                continue
+            elif g in self._virus_gene_set:
+                viral_detected += 1
+                viral_called += self.call_ct_value(g, v, well_type)
+            elif g in self._control_gene_set:
+                control_called += self.call_ct_value(g, v, well_type)
+
+        return viral_detected, viral_called, control_called
 
     def call_well(self, values) -> Call:
-        detected_genes = {g for g, v in values.items() if not self.isnan(v)}
-        called_genes = {
-            g for g, v in values.items() if self.call_ct_value(g, v, SAMPLE)
-        }
+        viral_detected, viral_called, control_called = self._count_called(
+            values, SAMPLE
+        )
 
-        if detected_genes.intersection(self.virus_genes):
+        if viral_detected:
             # viral genes were detected
-            if called_genes.issuperset(self.virus_genes):
+            if viral_called == self._n_virus_genes:
                 # if all viral genes were below cutoff, sample is positive
                 return Call.POS
             else:
@@ -122,7 +200,7 @@ class Protocol:
                 return Call.IND
         else:
             # no viral genes were detected at all
-            if called_genes == set(self.control_genes):
+            if control_called == self._n_control_genes:
                 # if the control genes are below cutoff, the sample is negative
                 return Call.NEG
             else:
@@ -130,22 +208,23 @@ class Protocol:
                 return Call.INV
 
     def check_control(self, values, control_type) -> Call:
-        called_genes = {
-            g for g, v in values.items() if self.call_ct_value(g, v, control_type)
-        }
+        _, viral_called, control_called = self._count_called(values, control_type)
         status = Call.FAIL
 
         if control_type in {ControlType.NTC, ControlType.PBS}:
             # no genes should be detected at all
-            if len(called_genes) == 0:
+            if viral_called == 0 and control_called == 0:
                 status = Call.PASS
         elif control_type == ControlType.PC:
             # all genes should all be detected below threshold
-            if called_genes == set(self.gene_cutoffs):
+            if (
+                viral_called == self._n_virus_genes
+                and control_called == self._n_control_genes
+            ):
                 status = Call.PASS
         elif control_type == ControlType.HRC:
             # only control genes detected, no viral genes at all
-            if called_genes == set(self.control_genes):
+            if viral_called == 0 and control_called == self._n_control_genes:
                 status = Call.PASS
         else:
             raise ValueError(f"Unrecognized control type: {control_type}.")
@@ -176,18 +255,28 @@ class Protocol:
 
         return detailed_status
 
-    def compare_wells(
-        self, results: WellResults, other_results: WellResults, cutoff: float
-    ):
+    def compare_wells(self, virus_cts: np.ndarray, cutoff: float) -> np.ndarray:
         """
-        Compares two positive wells and decides whether the first might be contamination
-        from the second. This version compares the mean of all viral genes. If any gene
-        is NaN, it will return False.
+        Compares all pairs of wells and decides whether the first might be
+        contamination from the second. ``virus_cts`` has a row of viral gene Cq values
+        per well, and entry [i, j] of the result is True if well i might be contaminated
+        by well j. This version compares the mean of all viral genes. If any gene is
+        NaN, the comparison is False.
         """
-        well_mean = np.mean([results.gene_cts[g] for g in self.virus_genes])
-        other_mean = np.mean([other_results.gene_cts[g] for g in self.virus_genes])
+        means = virus_cts.mean(axis=1)
+
+        return means[:, np.newaxis] - means[np.newaxis, :] > cutoff
 
-        return well_mean - other_mean > cutoff
+    def get_virus_cts(self, well_mapping: Dict[str, WellResults]) -> np.ndarray:
+        """An array with the viral gene Cq values for each well in the mapping"""
+        virus_genes = self._virus_gene_tuple
+        return np.array(
+            [
+                [results.gene_cts[g] for g in virus_genes]
+                for results in well_mapping.values()
+            ],
+            dtype=float,
+        ).reshape(len(well_mapping), len(virus_genes))
 
     def check_square(
         self,
@@ -195,6 +284,7 @@ class Protocol:
         radius: int,
         cutoff: float,
         flag: Call,
+        virus_cts: Optional[np.ndarray] = None,
     ):
         """
         Takes a list of wells with ct values and calls. For each positive well, check if
@@ -211,34 +301,33 @@ class Protocol:
             Cutoff to check when flagging a possible contamination
         flag :
             The Call type to set any flagged result
+        virus_cts :
+            The viral gene Cq values of the wells from get_virus_cts, if they were
+            already computed for this plate
         Returns
         -------
         list
             Returns a list of the wells that should be rerun due to possible overflow
         """
 
-        for well_id, results in well_mapping.items():
-            if not results.call.is_positive:
-                continue
-
-            row = ord(well_id[:1])
-            col = int(well_id[1:])
-
-            # Get the adjacent wells. This will look at wells within +- a given
-            # distance including the current well. Since the current well has no
-            # difference with itself it won't cause any issues to include it.
-            for other_row in map(chr, range(row - radius, row + radius + 1)):
-                for other_col in range(col - radius, col + radius + 1):
-                    other_well = f"{other_row}{other_col}"
-                    if other_well not in well_mapping:
-                        continue
-
-                    other_results = well_mapping.get(other_well)
-                    if not results.call.is_positive:
-                        continue
+        # compare every pair of wells at once, and keep the pairs that are neighbors.
+        # This will look at wells within +- a given distance including the current
+        # well. Since the current well has no difference with itself it won't cause
+        # any issues to include it.
+        if virus_cts is None:
+            virus_cts = self.get_virus_cts(well_mapping)
+        contaminated = self.compare_wells(virus_cts, cutoff)
+        contaminated &= _neighbor_matrix(tuple(well_mapping), radius)
+
+        positive = np.array(
+            [results.call.is_positive for results in well_mapping.values()],
+            dtype=bool,
+        )
+        flagged = positive & contaminated.any(axis=1)
 
-                    if self.compare_wells(results, other_results, cutoff):
-                        results.call = flag
+        for results, is_flagged in zip(well_mapping.values(), flagged):
+            if is_flagged:
+                results.call = flag
 
     def flag_contamination(self, well_mapping: Dict[str, WellResults]):
         self.check_square(
@@ -298,7 +387,7 @@ UDGprotocol = Protocol(
 )
 
 
-@dataclass
+@dataclass(frozen=True)
 class V3Protocol(Protocol):
     hot_well_radius: int = 3
     hot_well_cutoff: int = 22.0
@@ -311,28 +400,34 @@ class V3Protocol(Protocol):
         else:
             return super_call
 
-    def compare_wells(
-        self, results: WellResults, other_results: WellResults, cutoff: float
-    ):
+    def compare_wells(self, virus_cts: np.ndarray, cutoff: float) -> np.ndarray:
         """
-        Compares two positive wells and decides whether the first might be contamination
-        from the second. This version compares each gene separately and uses OR logic to
-        combine the results
+        Compares all pairs of wells and decides whether the first might be
+        contamination from the second. This version compares each gene separately and
+        uses OR logic to combine the results
         """
-        for g in self.virus_genes:
-            if results.gene_cts[g] - other_results.gene_cts[g] > cutoff:
-                return True
-        else:
-            return False
+        differences = virus_cts[:, np.newaxis, :] - virus_cts[np.newaxis, :, :]
+
+        return (differences > cutoff).any(axis=2)
 
     def flag_contamination(self, well_mapping: Dict[str, WellResults]):
+        # the Cq values are the same for both checks, so only collect them once
+        virus_cts = self.get_virus_cts(well_mapping)
         # first, check for "hot wells" that contaminate distant positives
         self.check_square(
-            well_mapping, self.hot_well_radius, self.hot_well_cutoff, Call.POS_HOTWELL
+            well_mapping,
+            self.hot_well_radius,
+            self.hot_well_cutoff,
+            Call.POS_HOTWELL,
+            virus_cts,
         )
         # then, check the neighbor wells. Given both possibilities, this is more likely
         self.check_square(
-            well_mapping, self.radius, self.pos_cluster_cutoff, Call.POS_CLUSTER
+            well_mapping,
+            self.radius,
+            self.pos_cluster_cutoff,
+            Call.POS_CLUSTER,
+            virus_cts,
         )
 
 
@@ -353,3 +448,9 @@ SOP_V3 = V3Protocol(
         Fluor.HEX: {MappedWell.B1: "RNAse P"},
     },
 )
+
+
+# lookup table for get_protocol. The protocols are all defined above
+_PROTOCOLS_BY_NAME = {
+    protocol.name: protocol for protocol in (SOP_V1, SOP_V2, UDGprotocol, SOP_V3)
+}
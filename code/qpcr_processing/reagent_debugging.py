@@ -4,17 +4,17 @@ import pandas as pd
 from lib.google import drive
 
 
-def color_other_plates_in_batch_used(val):
+def _make_colorer(used_barcodes):
     """
-    Takes a scalar and returns a string with
-    the css property `'color: red'` if strings in target list, black otherwise.
+    Returns a function that takes a scalar and returns a string with the css property
+    `'color: red'` if it is one of the used barcodes, black otherwise.
     """
-    color = (
-        "red"
-        if val in sum(batch_plates_previously_used[barcode_cols].values.tolist(), [])
-        else "black"
-    )
-    return "color: %s" % color
+
+    def color_other_plates_in_batch_used(val):
+        color = "red" if val in used_barcodes else "black"
+        return "color: %s" % color
+
+    return color_other_plates_in_batch_used
 
 
 def qpcr_run_debugging(args):
@@ -55,39 +55,50 @@ def qpcr_run_debugging(args):
     )  # +list(reagent_inventory.columns))
     reagent_used["barcode_of_this_run"] = list(list(run[barcode_cols].values)[0])
 
-    # Get the reagent plates prepared as a batch
-    reagent_batches = pd.DataFrame()
-    for i in reagent_used.index:
-        q = reagent_used.loc[i, "barcode_of_this_run"]
-        raux = reagent_inventory.loc[
-            reagent_inventory[reagent_inventory.isin([q])].dropna(thresh=1).index
-        ]
-        raux["barcode_of_this_run"] = q
-        raux["reagent_type_associated_with_barcode_for_this_run"] = i
-        reagent_batches = pd.concat([reagent_batches, raux], axis=0)
-
-    reagent_batches_grouped = (
-        reagent_batches.groupby(
-            ["reagent_type_associated_with_barcode_for_this_run", "barcode_of_this_run"]
-        )[
-            "reagent_type_associated_with_barcode_for_this_run",
-            "What reagent plate are you preparing?",
-        ]
-        .agg({"count": len, "set": set})
+    # Get the reagent plates prepared as a batch. Find the inventory rows that
+    # contain each barcode used in this run, with one pass over the inventory instead
+    # of one per barcode
+    inventory_values = (
+        reagent_inventory.rename_axis("inventory_row")
         .reset_index()
+        .melt(id_vars="inventory_row", value_name="barcode_of_this_run")
+        .dropna(subset=["barcode_of_this_run"])
+        .drop_duplicates(["inventory_row", "barcode_of_this_run"])
     )
-
-    reagent_batches_grouped.columns = [
-        "".join(col) for col in reagent_batches_grouped.columns
-    ]
-
-    reagent_batches_grouped = reagent_batches_grouped.rename(
-        columns={
-            "countWhat reagent plate are you preparing?": "how many batches associated with barcode for this run",
-            "setWhat reagent plate are you preparing?": "to what type of reagent plate do they match?",
-        }
+    # merge matches NaN keys to each other, so empty cells on either side are dropped
+    run_barcodes = (
+        reagent_used.rename_axis("reagent_type_associated_with_barcode_for_this_run")
+        .reset_index()
+        .dropna(subset=["barcode_of_this_run"])
+    )
+    run_barcodes["run_order"] = range(len(run_barcodes))
+    matches = run_barcodes.merge(
+        inventory_values, on="barcode_of_this_run"
+    ).sort_values(["run_order", "inventory_row"])
+
+    reagent_batches = reagent_inventory.loc[matches["inventory_row"]].assign(
+        barcode_of_this_run=matches["barcode_of_this_run"].values,
+        reagent_type_associated_with_barcode_for_this_run=matches[
+            "reagent_type_associated_with_barcode_for_this_run"
+        ].values,
     )
 
+    # count the batches and collect the reagent plate types, per barcode of this run
+    reagent_plate_types = reagent_batches.groupby(
+        ["reagent_type_associated_with_barcode_for_this_run", "barcode_of_this_run"]
+    )["What reagent plate are you preparing?"]
+    reagent_batches_grouped = pd.concat(
+        [
+            reagent_plate_types.size().rename(
+                "how many batches associated with barcode for this run"
+            ),
+            reagent_plate_types.unique()
+            .apply(set)
+            .rename("to what type of reagent plate do they match?"),
+        ],
+        axis=1,
+    ).reset_index()
+
     reagent_batches = reagent_batches.reset_index()
     batch_barcode_cols = [
         b for b in reagent_batches.columns if "Reagent Plate Barcode" in b
@@ -95,38 +106,41 @@ def qpcr_run_debugging(args):
     reagent_batches_barcodes = reagent_batches[batch_barcode_cols]
     bravo_runs_except_run = bravo_runs.drop(run.index, axis=0)
 
-    all_barcodes = sum(reagent_batches_barcodes.values.tolist(), [])
-    all_barcodes = [x for x in all_barcodes if str(x) != "nan"]
+    # flatten the barcodes, leaving out the empty (NaN) cells
+    all_barcodes = [
+        x for x in reagent_batches_barcodes.to_numpy().ravel().tolist() if x == x
+    ]
 
-    batch_plates_previously_used = bravo_runs_except_run.loc[
-        bravo_runs_except_run[bravo_runs_except_run.isin(all_barcodes)]
-        .dropna(thresh=1)
-        .index
+    # the other runs that used any of these barcodes, from one mask over all the runs
+    batch_plates_previously_used = bravo_runs_except_run[
+        bravo_runs_except_run.isin(all_barcodes).to_numpy().any(axis=1)
     ]
 
     batch_plates_previously_used = batch_plates_previously_used.reset_index()
 
-    writer = pd.ExcelWriter(filename, engine="openpyxl")  # xlsxwriter
-    run.to_excel(writer, sheet_name="problematic_run")
-    reagent_used.to_excel(writer, sheet_name="reagent_plates_used")
-    reagent_batches_grouped.to_excel(writer, sheet_name="reagent_plates_type")
-    reagent_batches.to_excel(writer, sheet_name="reagents_same_batch")
-    reagent_batches.style.applymap(color_other_plates_in_batch_used).to_excel(
-        writer, sheet_name="other_plates_in_batch_used"
-    )
-    batch_plates_previously_used.to_excel(
-        writer, sheet_name="run_info_plates_previously_used"
+    # collect the barcodes once, so coloring each cell is a set lookup
+    used_barcodes = frozenset(
+        v
+        for v in batch_plates_previously_used[barcode_cols].to_numpy().ravel().tolist()
+        if v == v and v is not None
     )
-    writer.save()
 
-    # Upload to Google Drive
+    # Write the workbook straight into the Google Drive upload, without a local copy
     write_folder_id = drive.get_folder_id_of_path(
         drive_service, ["Covid19", "Debugging"],
     )
-    with open(filename, "r") as in_fh, drive.put_file(
-        drive_service, write_folder_id, filename
-    ) as out_fh:
-        out_fh.write(in_fh.read())
+    with drive.put_file(drive_service, write_folder_id, filename) as out_fh:
+        with pd.ExcelWriter(out_fh, engine="openpyxl") as writer:
+            run.to_excel(writer, sheet_name="problematic_run")
+            reagent_used.to_excel(writer, sheet_name="reagent_plates_used")
+            reagent_batches_grouped.to_excel(writer, sheet_name="reagent_plates_type")
+            reagent_batches.to_excel(writer, sheet_name="reagents_same_batch")
+            reagent_batches.style.applymap(_make_colorer(used_barcodes)).to_excel(
+                writer, sheet_name="other_plates_in_batch_used"
+            )
+            batch_plates_previously_used.to_excel(
+                writer, sheet_name="run_info_plates_previously_used"
+            )
 
 
 def main():
@@ -1,7 +1,7 @@
 import os
 import re
 from pathlib import Path
-from typing import Match, Optional, Union
+from typing import Match, Optional, Pattern, Union
 
 from covidhub.constants import Fluor
 from covidhub.google.drive import DriveObject
@@ -18,6 +18,15 @@ class RunFiles:
     FILE_TYPE: str = "FILE_TYPE"
     FLUOR: str = "FLUOR"
 
+    # regular expression for matching files of the form
+    #   {barcode}{optional stuff like `_All Wells `}- +{file type}[_{fluor}].csv
+    # (matched against the whole basename with fullmatch, so it needs no anchors)
+    QPCR_FILE_PATTERN: Pattern = re.compile(
+        r"(?P<BARCODE>[A-Z0-9]+).*-\s*"
+        r"(?P<FILE_TYPE>[a-zA-Z ]+)"
+        r"(?:_(?P<FLUOR>[a-zA-Z0-9]+))?\.csv"
+    )
+
     def __init__(self, run_info=None, quant_cq=None, quant_amp=None):
         self.run_info = run_info
         self.quant_cq = quant_cq
@@ -40,17 +49,23 @@ class RunFiles:
         return all((self.run_info, self.quant_cq, self.quant_amp))
 
     @staticmethod
-    def get_qpcr_file_type(filename: str) -> Optional[Match]:
+    def extract_barcode_fast(filename: str) -> str:
+        """
+        cheap guess at the barcode of a qpcr output file, without running the regex:
+        the basename up to the first `_`, ` ` or `-`. If the guess is a valid barcode,
+        it is the barcode get_qpcr_file_type would find for that file.
+        """
+        barcode = os.path.basename(filename)
+        for separator in ("_", " ", "-"):
+            barcode = barcode.split(separator, 1)[0]
+        return barcode
+
+    @classmethod
+    def get_qpcr_file_type(cls, filename: str) -> Optional[Match]:
         """
-        regular expression for matching files of the form
-            {barcode}{optional stuff like `_All Wells `}- +{file type}[_{fluor}].csv
-        takes the basename of a qpcr output file and returns a match object (or None)
-        with barcode, file_type and optional fluor values
+        match a filename against QPCR_FILE_PATTERN: takes the basename of a qpcr
+        output file and returns a match object (or None) with barcode, file_type and
+        optional fluor values
         """
 
-        return re.match(
-            r"^(?P<BARCODE>[A-Z0-9]+).*-\s*"
-            r"(?P<FILE_TYPE>[a-zA-Z ]+)"
-            r"(?:_(?P<FLUOR>[a-zA-Z0-9]+))?\.csv$",
-            os.path.basename(filename),
-        )
+        return cls.QPCR_FILE_PATTERN.fullmatch(os.path.basename(filename))
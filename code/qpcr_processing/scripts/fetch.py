@@ -1,6 +1,9 @@
 import logging
 import pathlib
+import shutil
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from threading import local
 
 import covidhub.google.utils as gutils
 from covidhub.config import Config
@@ -10,6 +13,11 @@ from qpcr_processing.run_files import RunFiles
 
 logger = logging.getLogger(__name__)
 
+# number of barcodes to search for in each drive query
+BARCODES_PER_QUERY = 10
+# chunk size for copying the downloaded files to disk
+COPY_BUFFER_SIZE = 1 << 20
+
 
 def fetch_barcodes(args, cfg):
     google_credentials = gutils.get_secrets_manager_credentials(args.secret_id)
@@ -17,9 +25,18 @@ def fetch_barcodes(args, cfg):
 
     # qpcr logs folder
     logs_folder_id = drive.get_folder_id_of_path(drive_service, cfg.PCR_LOGS_FOLDER)
-    logs_folder_contents = drive.get_contents_by_folder_id(
-        drive_service, logs_folder_id, only_files=True
-    )
+    # only list the files that match the barcodes, a few barcodes per query to keep
+    # the query string short
+    logs_folder_contents = []
+    for i in range(0, len(args.barcodes), BARCODES_PER_QUERY):
+        logs_folder_contents.extend(
+            drive.get_contents_by_folder_id(
+                drive_service,
+                logs_folder_id,
+                only_files=True,
+                name_contains=args.barcodes[i : i + BARCODES_PER_QUERY],
+            )
+        )
 
     barcodes_to_fetch = defaultdict(RunFiles)
     for entry in logs_folder_contents:
@@ -29,6 +46,7 @@ def fetch_barcodes(args, cfg):
         elif m[RunFiles.BARCODE] in args.barcodes:
             barcodes_to_fetch[m[RunFiles.BARCODE]].add_file(m, entry)
 
+    files_to_fetch = []
     for barcode, barcode_files in barcodes_to_fetch.items():
         # all files must be present, at least one quant_amp file
         if not barcode_files.all_files:
@@ -37,24 +55,31 @@ def fetch_barcodes(args, cfg):
 
         logger.info(msg=f"Found sample to fetch: {barcode}")
 
-        # read in the run information and quant cq
-        run_info = barcode_files.run_info
-        logger.info(msg=f"    Downloading: {run_info.name}")
-        with drive.get_file(drive_service, run_info.id, binary=False) as fh:
-            with (args.output_dir / run_info.name).open("w") as out:
-                out.write(fh.read())
-
-        quant_cq = barcode_files.quant_cq
-        logger.info(msg=f"    Downloading: {quant_cq.name}")
-        with drive.get_file(drive_service, quant_cq.id, binary=False) as fh:
-            with (args.output_dir / quant_cq.name).open("w") as out:
-                out.write(fh.read())
-
-        for quant_amp in barcode_files.quant_amp.values():
-            logger.info(msg=f"    Downloading: {quant_amp.name}")
-            with drive.get_file(drive_service, quant_amp.id, binary=False) as fh:
-                with (args.output_dir / quant_amp.name).open("w") as out:
-                    out.write(fh.read())
+        # the run information, quant cq and quant amp files
+        files_to_fetch.append(barcode_files.run_info)
+        files_to_fetch.append(barcode_files.quant_cq)
+        files_to_fetch.extend(barcode_files.quant_amp.values())
+
+    # instantiate some thread-local storage for holding the HTTP clients.
+    tls = local()
+
+    def download_file(entry):
+        http_client = getattr(tls, "http", None)
+        if http_client is None:
+            http_client = gutils.new_http_client_from_service(drive_service)
+            setattr(tls, "http", http_client)
+
+        logger.info(msg=f"    Downloading: {entry.name}")
+        with drive.get_file(
+            drive_service, entry.id, binary=False, http=http_client
+        ) as fh:
+            with (args.output_dir / entry.name).open("w") as out:
+                shutil.copyfileobj(fh, out, COPY_BUFFER_SIZE)
+
+    # the downloads are independent, so run them concurrently
+    with ThreadPoolExecutor(max_workers=8) as tpe:
+        # wrapping this in a list raises any errors from the downloads
+        list(tpe.map(download_file, files_to_fetch))
 
 
 def main():
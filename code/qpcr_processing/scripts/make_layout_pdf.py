@@ -2,7 +2,9 @@ import argparse
 import json
 import logging
 import re
+import threading
 from collections import defaultdict
+from concurrent.futures import as_completed, ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, BinaryIO, Dict
 
@@ -16,9 +18,9 @@ from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Table, Tabl
 
 import covidhub.google.utils as gutils
 import qpcr_processing.accession as accession
-from covidhub.collective_form import clean_single_row, CollectiveForm
+from covidhub.collective_form import CollectiveForm
 from covidhub.config import Config
-from covidhub.constants import COLS_96, ROWS_96, VALID_ACCESSION
+from covidhub.constants import COLS_96, ROWS_96, VALID_ACCESSION, WELL_ID_GRID
 from covidhub.constants.qpcr_forms import SampleMetadata
 from covidhub.error import BadDriveURL, MetadataNotFoundError, MultipleRowsError
 from covidhub.google import drive
@@ -30,6 +32,11 @@ logger = logging.getLogger(__name__)
 # add this key to entry_data to indicate we're running locally
 LOCAL_RUN = "local_run"
 
+_VALID_ACCESSION_RE = re.compile(VALID_ACCESSION)
+
+# the (row, col) of each well id on the plate map
+_WELL_POSITIONS = {well_id: position for position, well_id in WELL_ID_GRID.items()}
+
 
 def format_time(cfg: Config, timestamp: str) -> str:
     """Format a timestamp string into the preferred YYYY-MM-DD HH:MM TZ format,
@@ -50,6 +57,41 @@ class _PDF:
     BARCODE_WIDTH = 0.0075 * inch  # the width of the skinniest individual bar
 
 
+_HEADER_FONT = getSampleStyleSheet()["Heading1"].fontName
+
+
+# this is the style for the overall table. Black gridlines,
+# and no padding around the values in the cells
+_TABLE_STYLE = TableStyle(
+    [
+        ("FONT", (0, 0), (-1, 0), _HEADER_FONT),  # bold header
+        ("FONTSIZE", (0, 0), (-1, 0), 16),
+        ("SPAN", (0, 0), (4, 0)),
+        ("SPAN", (5, 0), (8, 0)),
+        ("SPAN", (9, 0), (-1, 0)),
+        ("BOX", (1, 2), (-1, -1), 0.5, colors.black),
+        ("INNERGRID", (1, 2), (-1, -1), 0.5, colors.black),
+        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 0),
+        ("LEFTPADDING", (0, 0), (-1, -1), 0),
+        ("TOPPADDING", (0, 0), (-1, -1), 0),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 0),
+    ]
+)
+
+# the style for a mini-table inside a cell.
+# no grid, and a little padding
+_CELL_STYLE = TableStyle(
+    [
+        ("FONTSIZE", (0, 0), (-1, -1), 10),
+        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 2),
+        ("LEFTPADDING", (0, 0), (-1, -1), 2),
+    ]
+)
+
+
 def format_pdf(
     sample_barcode: str,
     accession_data: Dict[str, str],
@@ -73,7 +115,6 @@ def format_pdf(
     output_file_handle: BinaryIO
         file handle for writing the PDF
     """
-    styles = getSampleStyleSheet()
     doc = BaseDocTemplate(
         output_file_handle,
         pagesize=landscape(letter),
@@ -92,65 +133,33 @@ def format_pdf(
         ]
     )
 
-    # this is the style for the overall table. Black gridlines,
-    # and no padding around the values in the cells
-    table_style = TableStyle(
-        [
-            ("FONT", (0, 0), (-1, 0), styles["Heading1"].fontName),  # bold header
-            ("FONTSIZE", (0, 0), (-1, 0), 16),
-            ("SPAN", (0, 0), (4, 0)),
-            ("SPAN", (5, 0), (8, 0)),
-            ("SPAN", (9, 0), (-1, 0)),
-            ("BOX", (1, 2), (-1, -1), 0.5, colors.black),
-            ("INNERGRID", (1, 2), (-1, -1), 0.5, colors.black),
-            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-            ("RIGHTPADDING", (0, 0), (-1, -1), 0),
-            ("LEFTPADDING", (0, 0), (-1, -1), 0),
-            ("TOPPADDING", (0, 0), (-1, -1), 0),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 0),
-        ]
-    )
-
     plate_map_dict = defaultdict(dict)
 
-    # the style for a mini-table inside a cell.
-    # no grid, and a little padding
-    cell_style = TableStyle(
-        [
-            ("FONTSIZE", (0, 0), (-1, -1), 10),
-            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-            ("RIGHTPADDING", (0, 0), (-1, -1), 2),
-            ("LEFTPADDING", (0, 0), (-1, -1), 2),
-        ]
-    )
-
-    for row in ROWS_96:
-        for col in COLS_96:
-            well_id = f"{row}{col}"
-            if well_id not in accession_data:
-                continue
+    for well_id, well_data in accession_data.items():
+        position = _WELL_POSITIONS.get(well_id)
+        if position is None:
+            continue
 
-            well_data = accession_data[well_id]
-            if not re.match(VALID_ACCESSION, well_data):
-                continue
+        if not _VALID_ACCESSION_RE.match(well_data):
+            continue
 
-            cell_content = Table(
+        cell_content = Table(
+            [
                 [
-                    [
-                        Code128(
-                            well_data,
-                            barHeight=_PDF.BARCODE_HEIGHT,
-                            barWidth=_PDF.BARCODE_WIDTH,
-                        )
-                    ],
-                    [well_data],
-                ]
-            )
+                    Code128(
+                        well_data,
+                        barHeight=_PDF.BARCODE_HEIGHT,
+                        barWidth=_PDF.BARCODE_WIDTH,
+                    )
+                ],
+                [well_data],
+            ]
+        )
 
-            cell_content.setStyle(cell_style)
+        cell_content.setStyle(_CELL_STYLE)
 
-            plate_map_dict[row][col] = cell_content
+        row, col = position
+        plate_map_dict[row][col] = cell_content
 
     # Create plate map column labels
     plate_map_data = [
@@ -171,16 +180,17 @@ def format_pdf(
         ],
         ["", *(col for col in COLS_96)],
     ]
-    plate_map_data.extend(
-        [row, *(plate_map_dict[row].get(col, "") for col in COLS_96)] for row in ROWS_96
-    )
+    for row in ROWS_96:
+        # .get so that empty rows are not inserted into the defaultdict
+        row_cells = plate_map_dict.get(row, {})
+        plate_map_data.append([row] + [row_cells.get(col, "") for col in COLS_96])
 
     # this table will fill an entire landscape page
     plate_map = Table(
         plate_map_data,
         colWidths=[0.2 * inch] + [0.85 * inch] * 12,
         rowHeights=[0.5 * inch, 0.2 * inch] + [0.9 * inch] * 8,
-        style=table_style,
+        style=_TABLE_STYLE,
     )
 
     doc.build([plate_map])
@@ -291,23 +301,41 @@ def main():
     collective_form = CollectiveForm(
         drive_service, cfg["DATA"]["collection_form_spreadsheet_id"]
     )
-    sample_plate_metadata = collective_form[SampleMetadata.SHEET_NAME]
 
-    for barcode in args.barcodes:
-        try:
-            metadata_row = clean_single_row(
-                sample_plate_metadata, SampleMetadata.SAMPLE_PLATE_BARCODE, barcode
-            )
-        except MetadataNotFoundError:
-            logger.error(f"0 results for {barcode}, skipping")
-            continue
-        except MultipleRowsError as ex:
-            logger.error(f"{ex.match_count} results for {barcode}, skipping")
-            continue
-        metadata_row[SampleMetadata.TIMESTAMP] = str(
-            metadata_row[SampleMetadata.TIMESTAMP]
-        )
-        metadata_row[LOCAL_RUN] = (args.output_dir, drive_service)
+    # the drive service is not thread-safe, so each thread builds its own
+    thread_data = threading.local()
 
-        logger.debug(f"Making layout PDF for {barcode}")
+    def make_layout_pdf(metadata_row):
+        if not hasattr(thread_data, "drive_service"):
+            thread_data.drive_service = drive.get_service(google_creds)
+        metadata_row[LOCAL_RUN] = (args.output_dir, thread_data.drive_service)
         create_layout_pdf(cfg=cfg, entry_data=metadata_row)
+
+    with ThreadPoolExecutor(max_workers=min(16, len(args.barcodes))) as executor:
+        futures = {}
+        for barcode in args.barcodes:
+            try:
+                # single_row looks the barcode up in an index of the sheet built once
+                metadata_row = collective_form.single_row(
+                    SampleMetadata.SHEET_NAME,
+                    SampleMetadata.SAMPLE_PLATE_BARCODE,
+                    barcode,
+                )
+            except MetadataNotFoundError:
+                logger.error(f"0 results for {barcode}, skipping")
+                continue
+            except MultipleRowsError as ex:
+                logger.error(f"{ex.match_count} results for {barcode}, skipping")
+                continue
+            metadata_row[SampleMetadata.TIMESTAMP] = str(
+                metadata_row[SampleMetadata.TIMESTAMP]
+            )
+
+            logger.debug(f"Making layout PDF for {barcode}")
+            futures[executor.submit(make_layout_pdf, metadata_row)] = barcode
+
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception:
+                logger.exception(f"Failed to make layout PDF for {futures[future]}")
@@ -1,4 +1,5 @@
 import csv
+import hashlib
 import subprocess
 from pathlib import Path
 
@@ -32,6 +33,15 @@ COMPARISON_FILES = [
 ]
 
 
+def _digest(path: Path) -> bytes:
+    """SHA-256 of a file, read in chunks"""
+    h = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.digest()
+
+
 @pytest.mark.accession
 def test_accession_tracking():
     """
@@ -47,6 +57,10 @@ def test_accession_tracking():
 
     for output_file, comparison_file in zip(OUTPUT_FILES, COMPARISON_FILES):
         try:
+            # identical files match without parsing, otherwise compare row by row
+            if _digest(output_file) == _digest(comparison_file):
+                continue
+
             with output_file.open("r") as t1, comparison_file.open("r") as t2:
                 rdr1 = csv.reader(t1)
                 rdr2 = csv.reader(t2)
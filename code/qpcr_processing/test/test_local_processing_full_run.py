@@ -1,15 +1,29 @@
 import csv
+import filecmp
+import logging
+import os
 import shutil
 import subprocess
+import sys
 from pathlib import Path
 from typing import Sequence
 
 import pytest
 
 from covidhub.constants import PlateMapType
+from qpcr_processing.__main__ import main as qpcr_processing_main
+from qpcr_processing.processing import parse_qpcr_csv
 from qpcr_processing.run_files import RunFiles
 
 
+def _link_or_copy(src: Path, dst: Path):
+    """The inputs are only read, so a hard link is as good as a copy"""
+    try:
+        os.link(src, dst)
+    except (OSError, NotImplementedError):
+        shutil.copy(src, dst)
+
+
 class RunSet:
     """A RunSet describes all the data needed to invoke a local processing run,
     including the names of the files we get the input data from and the names of the
@@ -51,24 +65,19 @@ class RunSet:
         self.existence_output_filenames = existence_output_filenames
 
     def setup(self, src_path: Path, dst_path: Path):
-        input_filenames = [
-            self.runinfo_src_filename,
-            self.quant_cq_src_filename,
-            self.plate_map_src_filename,
-        ]
-
-        input_filenames.extend(self.amp_src_filenames)
-
-        output_filenames = [
-            self.runinfo_dst_filename,
-            self.quant_cq_dst_filename,
-            self.plate_map_dst_filename,
+        file_pairs = [
+            (self.runinfo_src_filename, self.runinfo_dst_filename),
+            (self.quant_cq_src_filename, self.quant_cq_dst_filename),
+            (self.plate_map_src_filename, self.plate_map_dst_filename),
+            *zip(self.amp_src_filenames, self.amp_dst_filenames),
         ]
 
-        output_filenames.extend(self.amp_dst_filenames)
-
-        for input_filename, output_filename in zip(input_filenames, output_filenames):
-            shutil.copy(src_path / input_filename, dst_path / output_filename)
+        for input_filename, output_filename in file_pairs:
+            src, dst = src_path / input_filename, dst_path / output_filename
+            # staging into the source directory would otherwise copy a file onto itself
+            if src.resolve() == dst.resolve():
+                continue
+            _link_or_copy(src, dst)
 
     def as_runfiles(self):
         run_files = RunFiles(self.runinfo_dst_filename, self.quant_cq_dst_filename)
@@ -249,26 +258,58 @@ SP000147_B132297 = NormalRunSet(
 )
 
 
-@pytest.mark.local_processing
-@pytest.mark.parametrize(
-    "runset",
-    [
-        SP000001_D041758,
-        SP000002_D041761,
-        SP000151_B131289,
-        SP000147_B132297,
-        SP000214_B131885,
-        SP000114_B132312,
-        pytest.param(SP000114_B132312_no_HEX, marks=pytest.mark.xfail),
-        pytest.param(SP000114_B132312_bad_plate_map, marks=pytest.mark.xfail),
-    ],
-)
-def test_local(tmp_path, runset):
-    """
-    Run a full test of local processing on a dataset. Checks for pdf creation
-    and that the output csv matches our stored one.
-    """
-    runset.setup(EXAMPLE_FILE_DIR, tmp_path)
+@pytest.fixture(scope="session")
+def staged_runsets(tmp_path_factory):
+    """Returns a function that stages the input files of a runset once per session,
+    and returns the directory they are in"""
+    staged = {}
+
+    def stage(runset: RunSet) -> Path:
+        if runset not in staged:
+            staging_path = tmp_path_factory.mktemp(runset.barcode)
+            runset.setup(EXAMPLE_FILE_DIR, staging_path)
+            staged[runset] = staging_path
+        return staged[runset]
+
+    return stage
+
+
+@pytest.fixture
+def restore_root_logger():
+    """create_logger replaces the handlers of the root logger, so put the original
+    handlers and level back after an in-process run"""
+    root_logger = logging.getLogger()
+    handlers = list(root_logger.handlers)
+    level = root_logger.level
+
+    yield
+
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+        if handler not in handlers:
+            handler.close()
+    for handler in handlers:
+        root_logger.addHandler(handler)
+    root_logger.setLevel(level)
+
+
+def _parse_qpcr_csv_and_close(args):
+    """Run local processing, then close the plate map file that argparse opened"""
+    try:
+        parse_qpcr_csv(args)
+    finally:
+        if args.plate_map_file is not None:
+            args.plate_map_file.close()
+
+
+def _link_inputs(staging_path: Path, run_path: Path):
+    """Populate a run directory with the staged inputs of a runset"""
+    for staged_file in staging_path.iterdir():
+        _link_or_copy(staged_file, run_path / staged_file.name)
+
+
+def _local_args(runset: RunSet, run_path: Path) -> Sequence[str]:
+    """The qpcr_processing command line for a local run of the runset"""
     if runset.plate_map_type == PlateMapType.LEGACY:
         plate_layout_arg = "--plate-layout"
     elif runset.plate_map_type == PlateMapType.WELLLIT:
@@ -278,7 +319,7 @@ def test_local(tmp_path, runset):
     else:
         assert False, "Must specify a plate map"
 
-    args = [
+    return [
         "qpcr_processing",
         "--secret-id",
         "covid-19/google_test_creds",
@@ -286,20 +327,68 @@ def test_local(tmp_path, runset):
         "--protocol",
         runset.sop,
         "--qpcr-run-path",
-        tmp_path,
+        str(run_path),
         plate_layout_arg,
-        tmp_path / runset.plate_map_dst_filename,
+        str(run_path / runset.plate_map_dst_filename),
     ]
 
-    subprocess.check_call(args)
 
+def _check_outputs(runset: RunSet, run_path: Path):
+    """Check for pdf creation and that the output csv matches our stored one"""
     for existence_output_filename in runset.existence_output_filenames:
-        assert (tmp_path / existence_output_filename).exists()
+        assert (run_path / existence_output_filename).exists()
+
+    generated_output = run_path / runset.generated_output_filename
+    reference_output = EXAMPLE_FILE_DIR / runset.reference_output_filename
 
-    with (tmp_path / runset.generated_output_filename).open("r") as t1, (
-        EXAMPLE_FILE_DIR / runset.reference_output_filename
-    ).open("r") as t2:
+    # identical files match without parsing, otherwise compare row by row
+    if filecmp.cmp(generated_output, reference_output, shallow=False):
+        return
+
+    with generated_output.open("r") as t1, reference_output.open("r") as t2:
         rdr1 = csv.reader(t1)
         rdr2 = csv.reader(t2)
         for row1, row2, in zip(rdr1, rdr2):
             assert row1 == row2
+
+
+@pytest.mark.local_processing
+@pytest.mark.parametrize(
+    "runset",
+    [
+        SP000001_D041758,
+        SP000002_D041761,
+        SP000151_B131289,
+        SP000147_B132297,
+        SP000214_B131885,
+        SP000114_B132312,
+        pytest.param(SP000114_B132312_no_HEX, marks=pytest.mark.xfail),
+        pytest.param(SP000114_B132312_bad_plate_map, marks=pytest.mark.xfail),
+    ],
+)
+def test_local(tmp_path, monkeypatch, restore_root_logger, staged_runsets, runset):
+    """
+    Run a full test of local processing on a dataset. Checks for pdf creation
+    and that the output csv matches our stored one. The command line is run in this
+    process, so the processing modules are only imported once.
+    """
+    _link_inputs(staged_runsets(runset), tmp_path)
+
+    monkeypatch.setattr(sys, "argv", _local_args(runset, tmp_path))
+    monkeypatch.setattr(
+        "qpcr_processing.__main__.parse_qpcr_csv", _parse_qpcr_csv_and_close
+    )
+    qpcr_processing_main()
+
+    _check_outputs(runset, tmp_path)
+
+
+@pytest.mark.local_processing
+def test_local_cli(tmp_path, staged_runsets):
+    """Run local processing through the installed qpcr_processing command"""
+    runset = SP000151_B131289
+    _link_inputs(staged_runsets(runset), tmp_path)
+
+    subprocess.check_call(_local_args(runset, tmp_path))
+
+    _check_outputs(runset, tmp_path)
@@ -50,3 +50,17 @@ def test_get_qpcr_file_type(test_input, expected):
 )
 def test_bad_file_names(test_input):
     assert RunFiles.get_qpcr_file_type(test_input) is None
+
+
+@pytest.mark.parametrize(
+    "test_input",
+    [
+        "logs/D041758_All Wells - Run Information.csv",
+        "B131267 -   Run Information.csv",
+        "B131267-Quantification Amplification Results_HEX.csv",
+        "lots/of/folders/B131267073149164483073149164483 - Run Information.csv",
+    ],
+)
+def test_extract_barcode_fast(test_input):
+    m = RunFiles.get_qpcr_file_type(test_input)
+    assert RunFiles.extract_barcode_fast(test_input) == m["BARCODE"]
@@ -1,12 +1,24 @@
 from dataclasses import dataclass
 from typing import Dict, Optional
 
-import pandas as pd
-
 from covidhub.constants import Call, ControlType, SIG_FIGS
 
+# scale for truncating ct values to the default number of significant figures
+_SCALE = 10 ** SIG_FIGS
+
+# string forms of the calls, computed once instead of for every well written. A well
+# that has not been called yet (call is None) has an empty call
+_CALL_STR = {None: "", **{call: str(call) for call in Call}}
+_CALL_SHORT = {None: "", **{call: call.short for call in Call}}
+_CALL_NEEDS_REVIEW = {None: "", **{call: call.needs_review for call in Call}}
+_CONTROL_CALL_STR = {
+    (control_type, call): f"{control_type} {_CALL_STR[call]}".rstrip()
+    for control_type in ControlType
+    for call in _CALL_STR
+}
 
-@dataclass
+
+@dataclass(init=False)
 class WellResults:
     """
     Class that holds results information for a well
@@ -23,30 +35,52 @@ class WellResults:
         the type of control in the well, if it is one
     """
 
-    accession: Optional[str] = "MISSING"
-    call: Call = None
-    gene_cts: Dict[str, float] = None
-    control_type: Optional[ControlType] = None
+    __slots__ = ("accession", "call", "gene_cts", "control_type")
+
+    accession: Optional[str]
+    call: Call
+    gene_cts: Dict[str, float]
+    control_type: Optional[ControlType]
+
+    def __init__(
+        self,
+        accession: Optional[str] = "MISSING",
+        call: Call = None,
+        gene_cts: Dict[str, float] = None,
+        control_type: Optional[ControlType] = None,
+    ):
+        self.accession = accession
+        self.call = call
+        self.gene_cts = gene_cts
+        self.control_type = control_type
 
     def __str__(self):
         if self.control_type is not None:
-            return f"{self.control_type} {self.call}"
+            return _CONTROL_CALL_STR[self.control_type, self.call]
         else:
-            return self.call.needs_review
+            return _CALL_NEEDS_REVIEW[self.call]
 
     def format_row(self):
         return [
             self.accession,
-            self.call.short,
-            *(self.format_ct(gene) for gene in self.gene_cts),
+            _CALL_SHORT[self.call],
+            *map(_format_ct_value, self.gene_cts.values()),
         ]
 
     def format_ct(self, gene: str, sig_figs: int = SIG_FIGS) -> str:
         """Format a ct value for output"""
-        value = self.gene_cts[gene]
+        return _format_ct_value(self.gene_cts[gene], sig_figs)
+
 
-        if value == "NaN" or value == "" or pd.isna(value):
+def _format_ct_value(value, sig_figs: int = SIG_FIGS) -> str:
+    """Truncate a ct value to sig_figs decimal places, or "" if it is missing"""
+    if isinstance(value, float):
+        # the usual case, NaN is the only float that is not equal to itself
+        if value != value:
             return ""
-        else:
-            value = int(value * 10 ** sig_figs) / 10 ** sig_figs
-            return f"{value:.{sig_figs}f}"
+    elif value is None or value == "NaN" or value == "" or value != value:
+        return ""
+
+    scale = _SCALE if sig_figs == SIG_FIGS else 10 ** sig_figs
+    value = int(value * scale) / scale
+    return f"{value:.{sig_figs}f}"